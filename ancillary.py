@@ -51,6 +51,18 @@ def clear_text_data(text):
     return text
 
 
+def export_row(number, row):
+    """
+    Format a row for export like reformat_table(table) in google_connector.py:
+    number | Eng | engT | EngEx | number | Rus | RusEX
+    :param number: int, the number of the row from 1
+    :param row: tuple (Eng, engT, EngEx, Rus, RusEx)
+    :return: list
+    """
+    eng, eng_t, eng_ex, rus, rus_ex = row
+    return [number, eng, eng_t, eng_ex, number, rus, rus_ex]
+
+
 def validate_host(key):
     valid = key.isdigit() | (key in "localhost.")
     return valid
@@ -0,0 +1,4 @@
+# Benchmarks for the hot paths of the program.
+# Run a module as a script from the work folder, e.g.
+# python -m benchmarks.sampling
+# benchmarks.suite runs all stages end to end and writes the results as JSON.
@@ -0,0 +1,100 @@
+# Time the column cleaning of table_classifier (data_columns, clear_data_drop_int, convert_empty_str_to_nan)
+# on a large sheet read from MS Excel and on a sheet as google_connector.load_table() returns it,
+# against the former loop over the columns with apply() on every cell
+
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.suite import write_workbook
+from benchmarks.vocabulary import synthetic_rows, user_sheet_rows
+from table_classifier import data_columns, clear_data_drop_int, convert_empty_str_to_nan
+
+ROWS = 100000
+REPEATS = 3
+
+
+def loop_data_columns(table):
+    """
+    The former data_columns(): dtypes of each column and str(x).isdigit() for each cell
+    It keeps a column of empty strings of a Google sheet, data_columns() drops it as empty
+    """
+    i = 0
+    j = 0
+    columns_to_rename = {}
+    while i in table.columns:
+        dtype_ = table[i].dtypes
+        if not (dtype_ in ('int64', 'float64')
+                or table[i].apply(lambda x: str(x).isdigit()).sum() >= len(table) // 2):
+            columns_to_rename[i] = j
+            j += 1
+        i += 1
+    return columns_to_rename
+
+
+def cell_by_cell_nan(table):
+    """
+    The former convert_empty_str_to_nan()
+    """
+    return table.apply(lambda column: column.map(lambda x: x if len(x) != 0 else np.nan))
+
+
+def best(function, *args, repeats=REPEATS):
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def excel_sheet(data, folder, random_state=0):
+    filename = os.path.join(folder, 'vocabulary.xlsx')
+    write_workbook(filename, data, sheets=1, random_state=random_state)
+    return pd.read_excel(filename, header=None)
+
+
+def google_sheet(data, random_state=0):
+    """
+    A sheet as load_table() returns it: all cells are strings, empty cells are empty strings
+    """
+    order = random.Random(random_state).sample(range(5), 5)
+    rows = [[str(number), *words, ''] for number, *words, _ in user_sheet_rows(data, order)]
+    return pd.DataFrame(rows, columns=None)
+
+
+def run(rows=ROWS):
+    data = list(synthetic_rows(rows))
+    with tempfile.TemporaryDirectory() as folder:
+        sheets = {'excel': excel_sheet(data, folder), 'google': google_sheet(data)}
+    expected = {1: 0, 2: 1, 3: 2, 4: 3, 5: 4}
+    results = {}
+    for name, table in sheets.items():
+        columns, sampled_time = best(data_columns, table)
+        assert columns == expected, columns
+        _, loop_time = best(loop_data_columns, table)
+        cleaned = clear_data_drop_int(table, columns)
+        assert cleaned.shape == (rows, 5)
+        results[name] = (loop_time, sampled_time)
+        print("{} sheet of {} rows: data_columns {:.3f} s, loop over the columns {:.3f} s".format(
+            name, rows, sampled_time, loop_time))
+        assert sampled_time < loop_time
+
+    table = sheets['google']
+    table.iloc[::10, 2] = ''
+    converted, convert_time = best(convert_empty_str_to_nan, table)
+    former, former_time = best(cell_by_cell_nan, table)
+    assert converted.equals(former) and converted[2].isna().sum() == -(-rows // 10)
+    print("convert_empty_str_to_nan {:.3f} s, cell by cell {:.3f} s".format(convert_time, former_time))
+    assert convert_time < former_time
+    results['convert_empty_str_to_nan'] = (former_time, convert_time)
+    return results
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,139 @@
+# A local stand-in for the part of gspread Client used by google_connector.py
+# Cells are kept in memory, requests are counted and quota errors may be simulated.
+
+import re
+
+from gspread.exceptions import APIError, SpreadsheetNotFound
+
+RANGE = re.compile(r"'(?P<title>.+)'!A(?P<first>\d+):(?P<column>[A-Z]+)(?P<last>\d*)")
+
+
+class FakeResponse:
+    """
+    The part of requests.Response which APIError reads
+    """
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.text = message
+        self._json = {'error': {'code': status_code, 'message': message, 'status': 'RESOURCE_EXHAUSTED'}}
+
+    def json(self):
+        return self._json
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title='Sheet1', rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = {}
+
+    def add_rows(self, rows):
+        self.spreadsheet.client.count_request()
+        self.row_count += rows
+
+    def col_values(self, col):
+        self.spreadsheet.client.count_request()
+        values = [self.cells.get((row, col), '') for row in range(1, self.row_count + 1)]
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def get_all_values(self):
+        self.spreadsheet.client.count_request()
+        return self.values()
+
+    def values(self):
+        last_row = max((row for row, _ in self.cells), default=0)
+        last_col = max((col for _, col in self.cells), default=0)
+        return [[str(self.cells.get((row, col), '')) for col in range(1, last_col + 1)]
+                for row in range(1, last_row + 1)]
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, title):
+        self.client = client
+        self.title = title
+        self.id = "fake-{}".format(len(client.spreadsheets))
+        self.sheet1 = FakeWorksheet(self)
+        self.shared_with = []
+        self.requested_ranges = []
+
+    def share(self, value, perm_type='user', role='owner'):
+        self.client.count_request()
+        self.shared_with.append((value, perm_type, role))
+
+    def values_update(self, cell_range, params=None, body=None):
+        self.client.count_request()
+        match = RANGE.match(cell_range)
+        first = int(match.group('first'))
+        last = int(match.group('last'))
+        values = body['values']
+        if last - first + 1 != len(values):
+            raise ValueError("Range {} does not fit {} rows".format(cell_range, len(values)))
+        if last > self.sheet1.row_count:
+            raise ValueError("Range {} exceeds the grid limits".format(cell_range))
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                self.sheet1.cells[(first + i, j + 1)] = value
+        return {'updatedRows': len(values)}
+
+    def values_get(self, cell_range, params=None):
+        self.client.count_request()
+        self.requested_ranges.append(cell_range)
+        first = int(RANGE.match(cell_range).group('first'))
+        values = self.sheet1.values()[first - 1:]
+        # Google API omits trailing empty cells
+        trimmed = []
+        for row in values:
+            row = list(row)
+            while row and row[-1] == '':
+                row.pop()
+            trimmed.append(row)
+        return {'values': trimmed} if trimmed else {}
+
+
+def append_rows(spreadsheet, rows):
+    """
+    Write rows below the last non-empty row of sheet 1 as a user would do
+    """
+    sheet = spreadsheet.sheet1
+    first = max((row for row, _ in sheet.cells), default=0) + 1
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            sheet.cells[(first + i, j + 1)] = value
+
+
+class FakeClient:
+    """
+    Fake gspread Client
+    :param fail_every: int (optional). Every fail_every-th request fails with HTTP 429
+    """
+
+    def __init__(self, fail_every=None):
+        self.spreadsheets = {}
+        self.requests = 0
+        self.failures = 0
+        self.fail_every = fail_every
+        self.auth = None
+
+    def count_request(self):
+        self.requests += 1
+        if self.fail_every and self.requests % self.fail_every == 0:
+            self.failures += 1
+            raise APIError(FakeResponse(429, "Quota exceeded"))
+
+    def create(self, title):
+        self.count_request()
+        spreadsheet = FakeSpreadsheet(self, title)
+        self.spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+    def open(self, title):
+        self.count_request()
+        try:
+            return self.spreadsheets[title]
+        except KeyError:
+            raise SpreadsheetNotFound
@@ -0,0 +1,75 @@
+# Compare the per-cell alphabet detection with the vectorized one in first_classifier()
+# The decisions are checked on every sheet of test_table.xlsx
+# The benchmark fails if the vectorized one is not REQUIRED_SPEEDUP times faster
+
+import time
+
+import pandas as pd
+
+from benchmarks.vocabulary import synthetic_rows
+from table_classifier import first_classifier, excel_parser, is_english, is_russian
+
+ROWS = 50000
+REPEATS = 3
+REQUIRED_SPEEDUP = 10
+
+
+def first_classifier_per_cell(table):
+    """
+    first_classifier() as it was before vectorization: is_english() and is_russian() for every cell
+    """
+    table = table.dropna()
+    num_of_rows = len(table.index)
+    eng, eng_t, rus = [], [], []
+    for i in range(len(table.columns)):
+        if table[i].apply(lambda x: is_english(x)).sum() >= num_of_rows // 2:
+            eng.append(i)
+        elif table[i].apply(lambda x: is_russian(x)).sum() >= num_of_rows // 2:
+            rus.append(i)
+        else:
+            eng_t.append(i)
+    return eng, rus, eng_t
+
+
+def check_decisions(filename='test_table.xlsx'):
+    """
+    :return: number of sheets with identical decisions and number of sheets
+    """
+    same = 0
+    sheets = 0
+    for table in excel_parser(filename):
+        sheets += 1
+        same += first_classifier(table) == first_classifier_per_cell(table)
+    return same, sheets
+
+
+def best(function, table, repeats=REPEATS):
+    """
+    :return: the result and the best time of several runs. The lookup table of the alphabets is built by the first one
+    """
+    times = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(table)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def run(rows=ROWS, required_speedup=REQUIRED_SPEEDUP):
+    table = pd.DataFrame(list(synthetic_rows(rows)))
+    per_cell, per_cell_time = best(first_classifier_per_cell, table)
+    vectorized, vectorized_time = best(first_classifier, table)
+    assert per_cell == vectorized
+    speedup = per_cell_time / vectorized_time
+    print("{} rows: per cell {:.3f} s, vectorized {:.3f} s, speedup {:.1f}x".format(
+        rows, per_cell_time, vectorized_time, speedup))
+    same, sheets = check_decisions()
+    print("test_table.xlsx: {} of {} sheets are classified identically".format(same, sheets))
+    assert same == sheets
+    assert speedup >= required_speedup, "The speedup {:.1f}x is less than {}x".format(speedup, required_speedup)
+    return per_cell_time, vectorized_time
+
+
+if __name__ == '__main__':
+    run()
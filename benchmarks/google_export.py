@@ -0,0 +1,31 @@
+# Time and verify google_connector.export_table() against the local fake of Google Sheets
+
+import time
+
+import google_connector
+from benchmarks.fake_gspread import FakeClient
+from benchmarks.vocabulary import synthetic_rows
+
+ROWS = 20000
+
+
+def run(rows=ROWS, fail_every=7):
+    data = list(synthetic_rows(rows))
+    client = FakeClient(fail_every=fail_every)
+    google_connector.RETRY_DELAY = 0
+    start = time.perf_counter()
+    spreadsheet = google_connector.export_table('google_api.json', 'user@userdomain.com', data[:rows // 2],
+                                                'benchmark', client=client)
+    google_connector.export_table('google_api.json', 'user@userdomain.com', data[rows // 2:],
+                                  'benchmark', append=True, client=client)
+    seconds = time.perf_counter() - start
+    sheet = spreadsheet.sheet1
+    assert sheet.cells[(1, 1)] == 1 and sheet.cells[(rows, 5)] == rows
+    assert [sheet.cells[(rows, col)] for col in (2, 3, 4, 6, 7)] == list(data[-1])
+    print("{} rows: {:.3f} s, {} requests, {} quota errors retried".format(
+        rows, seconds, client.requests, client.failures))
+    return seconds
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,52 @@
+# Time and verify the incremental import of Table.google_import() against the local fake of Google Sheets
+
+import os
+import tempfile
+import time
+
+from benchmarks.fake_gspread import FakeClient, append_rows
+from benchmarks.vocabulary import synthetic_rows
+from table import Table
+
+ROWS = 20000
+NEW_ROWS = 100
+
+
+def sheet_rows(rows, first_number=1):
+    """
+    Rows of a user spreadsheet: a column with numbers and the words in arbitrary order
+    """
+    return [[str(first_number + i), rus, eng, eng_t, rus_ex, eng_ex]
+            for i, (eng, eng_t, eng_ex, rus, rus_ex) in enumerate(rows)]
+
+
+def timed_import(table, client):
+    start = time.perf_counter()
+    result = table.google_import(incremental=True, client=client)
+    table.commit_sync()
+    return result, time.perf_counter() - start
+
+
+def run(rows=ROWS, new_rows=NEW_ROWS):
+    client = FakeClient()
+    spreadsheet = client.create('vocabulary')
+    data = list(synthetic_rows(rows + new_rows))
+    append_rows(spreadsheet, sheet_rows(data[:rows]))
+    with tempfile.TemporaryDirectory() as folder:
+        table = Table(google_notations={'your_json_file': 'google_api.json',
+                                        'table_name_for_import': 'vocabulary'},
+                      sync_file=os.path.join(folder, 'google_sync.pickle'))
+        first, first_time = timed_import(table, client)
+        append_rows(spreadsheet, sheet_rows(data[rows:], rows + 1))
+        second, second_time = timed_import(table, client)
+        third, third_time = timed_import(table, client)
+    assert len(first) == rows and len(second) == new_rows and len(third) == 0
+    assert second.values.tolist() == [list(row) for row in data[rows:]]
+    assert spreadsheet.requested_ranges[0] == "'Sheet1'!A{}:Z".format(rows)
+    print("full import of {} rows {:.3f} s, {} new rows {:.3f} s, no new rows {:.3f} s".format(
+        rows, first_time, new_rows, second_time, third_time))
+    return first_time, second_time, third_time
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,100 @@
+# Compare the pickled sklearn classifiers .sav with the compact models .npz of text_model:
+# load time in a new process (with the imports), memory allocated by loading, and the predictions.
+# The .npz files are shipped with the .sav files, loading the .sav files needs sklearn.
+# Export them again after relearning with python -c "import table_classifier; table_classifier.export_models()"
+
+import json
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.vocabulary import synthetic_rows
+from table_classifier import (ENG_MODEL_FILENAME, RUS_MODEL_FILENAME, RENAMED_SKLEARN_MODULES, excel_parser,
+                              first_classifier, load_pipeline)
+from text_model import LinearTextModel, compact_filename
+
+ROWS = 20000
+REPEATS = 3
+
+# Runs in a new process, so the imports are timed too
+LOAD_SCRIPT = """
+import json, pickle, sys, time, tracemalloc
+filename, renamed = sys.argv[1], json.loads(sys.argv[2])
+tracemalloc.start()
+start = time.perf_counter()
+if filename.endswith('.npz'):
+    from text_model import LinearTextModel
+    model = LinearTextModel.load(filename)
+else:
+    class Unpickler(pickle.Unpickler):
+        def find_class(self, module, name):
+            try:
+                return super().find_class(module, name)
+            except ImportError:
+                return super().find_class(renamed[module], name)
+    with open(filename, 'rb') as file:
+        model = Unpickler(file).load()
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'peak_bytes': tracemalloc.get_traced_memory()[1]}))
+"""
+
+
+def cold_load(filename, repeats=REPEATS):
+    """
+    Load a model in new processes
+    :return: dict with the best 'seconds' and 'peak_bytes' of the allocations
+    """
+    runs = [json.loads(subprocess.run([sys.executable, '-c', LOAD_SCRIPT, filename,
+                                       json.dumps(RENAMED_SKLEARN_MODULES)], check=True,
+                                      stdout=subprocess.PIPE, universal_newlines=True).stdout)
+            for _ in range(repeats)]
+    return min(runs, key=lambda result: result['seconds'])
+
+
+def pipeline_predict(pipeline, texts):
+    """
+    Predictions of a .sav model. The TfidfTransformer pickled by sklearn 0.21 has no idf_,
+    which newer versions of sklearn need for transform()
+    """
+    tfidf = pipeline.named_steps['tfidf']
+    if tfidf.use_idf and not hasattr(tfidf, 'idf_'):
+        tfidf.idf_ = np.ravel(tfidf._idf_diag.sum(axis=0))
+    return pipeline.predict(texts)
+
+
+def columns_to_predict(rows=ROWS):
+    """
+    Columns of test_table.xlsx and of a synthetic vocabulary
+    """
+    columns = []
+    for table in excel_parser('test_table.xlsx'):
+        table = table.dropna()
+        eng, rus, eng_t = first_classifier(table)
+        columns.extend(table[column].astype(str).tolist() for column in eng + rus)
+    data = list(synthetic_rows(rows))
+    columns.extend([row[i] for row in data] for i in (0, 2, 3, 4))
+    return columns
+
+
+def run(filenames=(ENG_MODEL_FILENAME, RUS_MODEL_FILENAME)):
+    columns = columns_to_predict()
+    results = {}
+    for filename in filenames:
+        pipeline = load_pipeline(filename)
+        compact = LinearTextModel.load(compact_filename(filename))
+        differences = sum(int((pipeline_predict(pipeline, column) != compact.predict(column)).sum())
+                          for column in columns)
+        sav = cold_load(filename)
+        npz = cold_load(compact_filename(filename))
+        results[filename] = {'sav': sav, 'npz': npz, 'differences': differences}
+        print("{}: load {:.3f} s / {:.0f} KB allocated, .npz {:.3f} s / {:.0f} KB, "
+              "{} different predictions of {} texts".format(
+                  filename, sav['seconds'], sav['peak_bytes'] / 1024, npz['seconds'], npz['peak_bytes'] / 1024,
+                  differences, sum(len(column) for column in columns)))
+        assert differences == 0
+    return results
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,59 @@
+# Compare ORDER BY RAND() sampling (random_rows) with the id probing sampler (random_sample)
+# The benchmark needs admin.pickle (see new_user.py). It creates and drops the database 'benchmark_db'.
+
+import time
+
+from benchmarks.vocabulary import synthetic_rows
+from configs import Loader
+from my_sql_connector import create_database, create_table, modify_database, query_database, bulk_insert, \
+    random_rows, random_sample, learn_new
+
+SIZES = (10000, 100000, 1000000)
+LIMIT = 10
+REPEATS = 5
+
+
+def best_time(function, repeats=REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def prepare_database(config, database_name='benchmark_db'):
+    config = dict(config)
+    create_database(config, database_name)
+    config['database'] = database_name
+    modify_database(config, "DROP TABLE IF EXISTS en_voc;")
+    create_table(config, 'en_voc')
+    return config
+
+
+def run(config, sizes=SIZES, limit=LIMIT):
+    """
+    Fill the table up to each size and time both samplers on learn_new() query
+    :param config: dict with admin credentials, see my_sql_connector.query_database for details
+    :param sizes: tuple of table sizes in ascending order
+    :param limit: int, number of rows sampled
+    :return: list of tuples (size, seconds for ORDER BY RAND(), seconds for random_sample)
+    """
+    config = prepare_database(config)
+    results = []
+    size = 0
+    for new_size in sizes:
+        bulk_insert(config, synthetic_rows(new_size - size), chunk_size=5000)
+        size = new_size
+        # a half of the words is learned
+        modify_database(config, "UPDATE en_voc SET wellknown = id % 2;")
+        order_by_rand = best_time(lambda: list(query_database(config, random_rows(learn_new(), limit))))
+        probing = best_time(lambda: random_sample(config, learn_new(), limit))
+        results.append((size, order_by_rand, probing))
+        print("{:>9} rows: ORDER BY RAND() {:.4f} s, random_sample {:.4f} s".format(size, order_by_rand, probing))
+    modify_database(config, "DROP DATABASE {};".format(config['database']))
+    return results
+
+
+if __name__ == '__main__':
+    run(Loader(config_file='admin.pickle').mysql_notations)
@@ -0,0 +1,73 @@
+# Run the operations of the program against the SQLite backend and time them.
+# No MySQL server is needed: the database is a temporary file.
+
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.vocabulary import synthetic_rows
+from my_sql_connector import create_table, upgrade_schema, bulk_insert, count_words, query_database, \
+    random_sample, learn_new, learn_all, from_within_last_n_days, review_batch, mark_as_learned, \
+    mark_as_unlearned, hide_word_forever, SESSION_COLUMNS, SCHEMA_VERSION
+from scheduler import apply_reviews, QUALITY_CORRECT, QUALITY_WRONG
+from session import fetch_session_batch, WordStateCache, LEARN_NEW
+from storage import close_backends
+
+ROWS = 100000
+LIMIT = 10
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run(rows=ROWS, limit=LIMIT):
+    with tempfile.TemporaryDirectory() as folder:
+        config = {'backend': 'sqlite', 'database': os.path.join(folder, 'benchmark_db')}
+        try:
+            create_table(config, 'en_voc')
+            assert upgrade_schema(config) == SCHEMA_VERSION
+            data = list(synthetic_rows(rows))
+            report, _ = timed(bulk_insert, config, data)
+            # the English words repeat the rows of the table, so they update them instead of adding doubles
+            bulk_insert(config, [(eng.upper() + ' ', eng_t, eng_ex, rus, rus_ex)
+                                 for eng, eng_t, eng_ex, rus, rus_ex in data[:limit]])
+            words = len({eng for eng, *_ in data})
+            assert count_words(config) == (0, words)
+
+            batch, sample_time = timed(fetch_session_batch, config, LEARN_NEW, limit)
+            assert len(batch) == limit and len(set(batch.ids)) == limit
+            assert len(random_sample(config, learn_all(), limit)) == limit
+
+            mark_as_learned(config, batch.ids[:3])
+            mark_as_unlearned(config, batch.ids[:1])
+            hide_word_forever(config, batch.ids[3:4])
+            assert count_words(config) == (2, words - 3)
+            assert len(list(query_database(config, from_within_last_n_days(1)))) == 2
+            assert len(list(query_database(config, learn_new()))) == words - 3
+
+            cache = WordStateCache(batch)
+            cache.review(batch.ids[5], QUALITY_CORRECT)
+            cache.review(batch.ids[6], QUALITY_WRONG)
+            assert cache.flush(config) == 2
+            due = dict(query_database(config, "SELECT id, due FROM en_voc WHERE due IS NOT NULL;"))
+            tomorrow = (date.today() + timedelta(days=1)).isoformat()
+            assert due == {batch.ids[5]: tomorrow, batch.ids[6]: tomorrow}
+            assert apply_reviews(config, {batch.ids[5]: QUALITY_CORRECT}) == 1
+
+            reviews, review_time = timed(review_batch, config, limit, SESSION_COLUMNS)
+            assert len(reviews) == limit and batch.ids[5] not in [row[0] for row in reviews]
+            _, count_time = timed(count_words, config)
+        finally:
+            close_backends()
+    print("{} rows inserted at {:.0f} rows/s, session sampled in {:.4f} s, "
+          "due words in {:.4f} s, statistics in {:.4f} s".format(report['rows'], report['rows_per_second'],
+                                                                 sample_time, review_time, count_time))
+    return report, sample_time, review_time, count_time
+
+
+if __name__ == '__main__':
+    run()
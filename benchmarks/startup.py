@@ -0,0 +1,50 @@
+# Time the imports of language_training.pyw in a new process and check that the modules which are needed only
+# for import and export (language_training.DEFERRED_MODULES) are not loaded by the start of the program.
+# The imports of the former start, with table_classifier, google_connector and openpyxl, are timed for comparison.
+# No display is needed: the windows are not created. For the whole start with the windows and the connection
+# to the database run
+# python language_training.pyw --startup-time
+
+import json
+import subprocess
+import sys
+
+REPEATS = 5
+
+# Runs in a new process: the module code of language_training.pyw without its __main__ block
+STARTUP_SCRIPT = """
+import json, runpy, sys, time
+start = time.perf_counter()
+program = runpy.run_path('language_training.pyw', run_name='startup')
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds,
+                  'loaded': [name for name in program['DEFERRED_MODULES'] if name in sys.modules]}))
+"""
+
+EAGER_SCRIPT = """
+import json, runpy, sys, time
+start = time.perf_counter()
+import table_classifier, google_connector, openpyxl, OpenSSL
+runpy.run_path('language_training.pyw', run_name='startup')
+print(json.dumps({'seconds': time.perf_counter() - start, 'loaded': []}))
+"""
+
+
+def best_run(script, repeats=REPEATS):
+    runs = [json.loads(subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE,
+                                      universal_newlines=True).stdout)
+            for _ in range(repeats)]
+    return min(runs, key=lambda result: result['seconds'])
+
+
+def run(repeats=REPEATS):
+    lazy = best_run(STARTUP_SCRIPT, repeats)
+    assert not lazy['loaded'], "Deferred modules are loaded on the start: {}".format(lazy['loaded'])
+    eager = best_run(EAGER_SCRIPT, repeats)
+    print("imports of the program {:.3f} s, with the import and export modules {:.3f} s".format(
+        lazy['seconds'], eager['seconds']))
+    return lazy['seconds'], eager['seconds']
+
+
+if __name__ == '__main__':
+    run()
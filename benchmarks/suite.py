@@ -0,0 +1,339 @@
+# End-to-end benchmark of the hot paths of the program on a synthetic vocabulary.
+#
+# python -m benchmarks.suite --rows 20000 --output results.json
+# python -m benchmarks.suite --rows 20000 --baseline results.json
+#
+# The database is a temporary SQLite file by default. With --mysql the stages run against
+# the MySQL server of admin.pickle (see new_user.py) in the database 'benchmark_db' which is dropped at the end.
+# The stages run --runs times and the best time of each stage is reported, as for the repeated stages.
+# With --baseline the results are compared with a previous run and the exit code is 1 if a stage is slower
+# than the baseline by more than the tolerance and by more than the noise floor.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+import google_connector
+from ancillary import export_row
+from benchmarks.fake_gspread import FakeClient
+from benchmarks.sampling import prepare_database
+from benchmarks.vocabulary import synthetic_rows, user_sheet_rows
+from configs import Loader
+from excel_connector import stream_to_excel
+from google_connector import prepare_table_to_export
+from my_sql_connector import create_table, bulk_insert, delete_doubles, modify_database, query_database, \
+    query_batches, random_rows, random_sample, count_words, review_batch, learn_new, learn_all
+from storage import close_backends
+from table import Table
+from table_classifier import read_workbook, classify_table
+
+ROWS = 20000
+SHEETS = 4
+LIMIT = 10
+REPEATS = 5
+# Runs of all stages, the best time of each stage is kept
+RUNS = 3
+# A stage is a regression if it is slower than the baseline by more than this share
+TOLERANCE = 0.25
+# ... and by more than this many seconds: the timer noise of a stage of a few milliseconds exceeds the tolerance
+NOISE_FLOOR = 0.01
+RESULTS_FORMAT = 1
+
+
+def write_workbook(filename, rows, sheets=SHEETS, random_state=None):
+    """
+    Write a vocabulary to an MS Excel file. Each sheet has its own order of columns
+    :param filename: path to the .xlsx file
+    :param rows: list of tuples ('Eng', 'engT', 'EngEx', 'Rus', 'RusEx')
+    :param sheets: int, number of sheets
+    :param random_state: int (optional)
+    :return: number of rows
+    """
+    rng = random.Random(random_state)
+    workbook = Workbook(write_only=True)
+    size = -(-len(rows) // sheets)
+    for number in range(sheets):
+        sheet = workbook.create_sheet(title='Sheet{}'.format(number + 1))
+        order = rng.sample(range(5), 5)
+        for row in user_sheet_rows(rows[number * size:(number + 1) * size], order, number * size + 1):
+            sheet.append(row)
+    workbook.save(filename)
+    return len(rows)
+
+
+class Stages:
+    """
+    Timings of the stages of one run.
+
+    Methods:
+    time,
+    best,
+    skip
+    """
+
+    def __init__(self):
+        self.results = []
+
+    def _add(self, stage, rows, seconds, **extra):
+        result = {'stage': stage,
+                  'rows': rows,
+                  'seconds': seconds,
+                  'rows_per_second': rows / seconds if seconds > 0 else None}
+        result.update(extra)
+        self.results.append(result)
+        print("{:<28} {:>9} rows {:>10.4f} s".format(stage, rows, seconds), file=sys.stderr)
+        return result
+
+    def time(self, stage, function, *args):
+        """
+        Run a stage once
+        :param stage: String, the name of the stage
+        :param function: function which returns the number of rows processed
+        :return: the number of rows
+        """
+        start = time.perf_counter()
+        rows = function(*args)
+        self._add(stage, rows, time.perf_counter() - start)
+        return rows
+
+    def best(self, stage, function, *args, repeats=REPEATS):
+        """
+        Run a stage which does not change the data several times and keep the best time
+        :return: the number of rows of the last run
+        """
+        times = []
+        rows = 0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            rows = function(*args)
+            times.append(time.perf_counter() - start)
+        self._add(stage, rows, min(times), repeats=repeats)
+        return rows
+
+    def skip(self, stage, reason):
+        self.results.append({'stage': stage, 'skipped': reason})
+        print("{:<28} skipped: {}".format(stage, reason), file=sys.stderr)
+
+
+def parse_workbook(filename, tables):
+    tables.extend(sheet['table'] for sheet in read_workbook(filename, classify=False))
+    return sum(len(table) for table in tables)
+
+
+def classify_tables(tables, sample):
+    for table in tables:
+        classify_table(table, sample=sample)
+    return sum(len(table) for table in tables)
+
+
+def import_workbook(filename):
+    table = Table(excel_notations={'file_path_for_import': filename})
+    imported, not_recognized, errors = table.excel_import()
+    if not_recognized:
+        raise AssertionError("Sheets {} are not recognized: {}".format(not_recognized, errors))
+    return len(imported)
+
+
+def accumulate_rows(rows, table):
+    for row in rows:
+        table.add_row(row)
+    return len(table.table)
+
+
+def insert(config, rows):
+    return bulk_insert(config, rows)['rows']
+
+
+def remove_doubles(config):
+    delete_doubles(config)
+    return next(query_database(config, "SELECT COUNT(id) FROM en_voc;"))[0]
+
+
+def select_count(config, query):
+    return len(list(query_database(config, query)))
+
+
+def export_excel(config, filename):
+    return stream_to_excel(query_batches(config, learn_all()), filename)
+
+
+def export_google(rows):
+    google_connector.RETRY_DELAY = 0
+    spreadsheet = google_connector.export_table('google_api.json', 'user@userdomain.com', rows, 'benchmark',
+                                                client=FakeClient())
+    return len(spreadsheet.sheet1.col_values(1))
+
+
+def prepare_export(table):
+    values, cell_range = prepare_table_to_export(table)
+    return len(values) // 7
+
+
+def run_stages(config, folder, rows=ROWS, sheets=SHEETS, limit=LIMIT, random_state=0, mysql=False):
+    """
+    Time the stages from a workbook to the database and back
+    :param config: dict, an empty database, see my_sql_connector.query_database for details
+    :param folder: a folder for the files
+    :param rows: int, size of the vocabulary
+    :param sheets: int, number of sheets of the workbook
+    :param limit: int, number of rows of a training session
+    :param random_state: int, seed of the vocabulary
+    :param mysql: bool, the database is MySQL
+    :return: list of dicts
+    """
+    stages = Stages()
+    data = list(synthetic_rows(rows, random_state))
+    workbook = os.path.join(folder, 'vocabulary.xlsx')
+
+    stages.time('write_workbook', write_workbook, workbook, data, sheets, random_state)
+    tables = []
+    stages.time('excel_parser', parse_workbook, workbook, tables)
+    stages.best('classify_table_sampled', classify_tables, tables, True)
+    stages.best('classify_table_full', classify_tables, tables, False)
+    stages.time('excel_import', import_workbook, workbook)
+    table = Table()
+    stages.time('table_add_row', accumulate_rows, data, table)
+
+    stages.time('insert_rows', insert, config, data)
+    stages.time('insert_rows_again', insert, config, data)
+    if mysql:
+        stages.time('delete_doubles', remove_doubles, config)
+    else:
+        stages.skip('delete_doubles', "MySQL only. Doubles are rejected on insert by the unique key")
+    # a half of the words is learned
+    modify_database(config, "UPDATE en_voc SET wellknown = id % 2;")
+
+    stages.best('random_rows', select_count, config, random_rows(learn_new(), limit))
+    stages.best('random_sample', lambda: len(random_sample(config, learn_new(), limit)))
+    stages.best('review_batch', lambda: len(review_batch(config, limit)))
+    stages.best('count_words', lambda: sum(count_words(config)))
+
+    stages.time('excel_export', export_excel, config, os.path.join(folder, 'export.xlsx'))
+    stages.time('export_rows', lambda: len([export_row(n, row) for n, row in enumerate(data, 1)]))
+    stages.time('prepare_table_to_export', prepare_export, table.table)
+    stages.time('google_export', export_google, data)
+    return stages.results
+
+
+def best_results(runs):
+    """
+    Merge the results of several runs of the stages, the time of a stage is the best of the runs
+    :param runs: list of lists returned by run_stages()
+    :return: list of dicts
+    """
+    merged = []
+    for results in zip(*runs):
+        result = dict(results[0])
+        if 'seconds' in result:
+            result['seconds'] = min(r['seconds'] for r in results)
+            result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] > 0 else None
+            result['runs'] = len(results)
+        merged.append(result)
+    return merged
+
+
+def run(rows=ROWS, sheets=SHEETS, limit=LIMIT, random_state=0, mysql_config=None, runs=RUNS):
+    """
+    Run all stages on a new database several times
+    :param mysql_config: dict with admin credentials (optional). SQLite is used if it is None
+    :param runs: int, number of runs, see best_results()
+    :return: dict with keys 'format', 'meta', 'results'
+    """
+    results = best_results([run_once(rows, sheets, limit, random_state, mysql_config) for _ in range(runs)])
+    return {'format': RESULTS_FORMAT,
+            'meta': {'backend': 'sqlite' if mysql_config is None else 'mysql',
+                     'rows': rows,
+                     'sheets': sheets,
+                     'limit': limit,
+                     'random_state': random_state,
+                     'runs': runs,
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'date': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def run_once(rows, sheets, limit, random_state, mysql_config):
+    """
+    Run all stages on a new database
+    :return: list of dicts, see run_stages()
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        if mysql_config is None:
+            config = {'backend': 'sqlite', 'database': os.path.join(folder, 'benchmark_db')}
+            create_table(config, 'en_voc')
+        else:
+            config = prepare_database(mysql_config)
+        try:
+            results = run_stages(config, folder, rows, sheets, limit, random_state, mysql_config is not None)
+        finally:
+            if mysql_config is not None:
+                modify_database(config, "DROP DATABASE {};".format(config['database']))
+            close_backends()
+    return results
+
+
+def compare(report, baseline, tolerance=TOLERANCE, noise_floor=NOISE_FLOOR):
+    """
+    Find the stages which became slower than in the baseline.
+    Only the stages with the same number of rows are compared
+    :param report: dict, see run()
+    :param baseline: dict, see run()
+    :param tolerance: float, allowed slowdown as a share of the baseline time
+    :param noise_floor: float, slowdowns of fewer seconds are ignored
+    :return: list of tuples (stage, baseline seconds, seconds)
+    """
+    old = {result['stage']: result for result in baseline['results'] if 'seconds' in result}
+    regressions = []
+    for result in report['results']:
+        previous = old.get(result['stage'])
+        if 'seconds' not in result or previous is None or previous['rows'] != result['rows']:
+            continue
+        slowdown = result['seconds'] - previous['seconds']
+        if slowdown > previous['seconds'] * tolerance and slowdown > noise_floor:
+            regressions.append((result['stage'], previous['seconds'], result['seconds']))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import, database and export stages")
+    parser.add_argument('--rows', type=int, default=ROWS, help="size of the synthetic vocabulary")
+    parser.add_argument('--sheets', type=int, default=SHEETS, help="number of sheets of the workbook")
+    parser.add_argument('--limit', type=int, default=LIMIT, help="number of words in a training session")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic vocabulary")
+    parser.add_argument('--mysql', action='store_true', help="use MySQL server of admin.pickle instead of SQLite")
+    parser.add_argument('--runs', type=int, default=RUNS, help="runs of the stages, the best time is kept")
+    parser.add_argument('--output', help="write the results to a .json file instead of stdout")
+    parser.add_argument('--baseline', help="compare the results with a .json file of a previous run")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed slowdown against the baseline, e.g. 0.25 for 25%%")
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR,
+                        help="slowdowns of fewer seconds are not regressions")
+    args = parser.parse_args(arguments)
+
+    mysql_config = Loader(config_file='admin.pickle').mysql_notations if args.mysql else None
+    report = run(args.rows, args.sheets, args.limit, args.seed, mysql_config, args.runs)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance, args.noise_floor)
+        for stage, old_seconds, seconds in regressions:
+            print("Regression: {} {:.4f} s -> {:.4f} s".format(stage, old_seconds, seconds), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Time Table.add_row() for a large table against the former pd.concat() per row
+
+import time
+
+import pandas as pd
+
+from benchmarks.vocabulary import synthetic_rows
+from table import Table
+
+ROWS = 100000
+# pd.concat() per row is quadratic, so it is timed on a smaller table
+CONCAT_ROWS = 10000
+
+
+def concat_per_row(rows):
+    table = pd.DataFrame(columns=[0, 1, 2, 3, 4])
+    for row in rows:
+        table = pd.concat([table, pd.DataFrame(row).T], axis=0)
+    return table
+
+
+def buffered(rows):
+    table = Table()
+    for row in rows:
+        table.add_row(row)
+    return table.table
+
+
+def timed(function, rows):
+    start = time.perf_counter()
+    result = function(rows)
+    return time.perf_counter() - start, len(result)
+
+
+def run(rows=ROWS, concat_rows=CONCAT_ROWS):
+    data = list(synthetic_rows(rows))
+    concat_time, concat_len = timed(concat_per_row, data[:concat_rows])
+    buffered_small_time, _ = timed(buffered, data[:concat_rows])
+    buffered_time, buffered_len = timed(buffered, data)
+    print("{} rows: pd.concat per row {:.2f} s, Table.add_row {:.3f} s".format(
+        concat_len, concat_time, buffered_small_time))
+    print("{} rows: Table.add_row {:.3f} s".format(buffered_len, buffered_time))
+    return concat_time, buffered_small_time, buffered_time
+
+
+if __name__ == '__main__':
+    run()
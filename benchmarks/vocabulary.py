@@ -0,0 +1,37 @@
+# Synthetic vocabulary for the benchmarks
+
+import random
+import string
+
+ENGLISH_LETTERS = string.ascii_lowercase
+RUSSIAN_LETTERS = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+TRANSCRIPTION_SYMBOLS = 'ˈˌːʌæʃəɪɔʤŋθðʊɜ'
+
+
+def synthetic_rows(number, random_state=None):
+    """
+    Generator of fake vocabulary rows
+    :param number: int, number of rows
+    :param random_state: int (optional). The same seed gives the same rows
+    :return: tuples ('Eng', 'engT', 'EngEx', 'Rus', 'RusEx')
+    """
+    rng = random.Random(random_state)
+    for _ in range(number):
+        word = ''.join(rng.choices(ENGLISH_LETTERS, k=rng.randint(3, 12)))
+        translation = ''.join(rng.choices(RUSSIAN_LETTERS, k=rng.randint(3, 12)))
+        yield (word,
+               "[{}]".format(''.join(rng.choices(TRANSCRIPTION_SYMBOLS, k=len(word)))),
+               "This is an example with the word {}.".format(word),
+               translation,
+               "Это пример со словом {}.".format(translation))
+
+
+def user_sheet_rows(rows, order, first_number=1):
+    """
+    Rows of a sheet as a user keeps them: a column with numbers, the words in arbitrary order and an empty column
+    :param rows: list of tuples ('Eng', 'engT', 'EngEx', 'Rus', 'RusEx')
+    :param order: permutation of range(5), the order of the columns of the words
+    :param first_number: int, the number of the first row
+    :return: list of lists
+    """
+    return [[first_number + i] + [row[column] for column in order] + [None] for i, row in enumerate(rows)]
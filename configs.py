@@ -12,12 +12,14 @@ mysql_default_notations = {'user': 'user',
                            'password': 'pass',
                            'host': 'localhost',
                            'use_pure': False,
+                           'backend': 'mysql',
                            'database': 'user_db'}
 
 google_default_notations = {'your_json_file': 'google_api.json',
                             'user_email': 'user@userdomain.com',
                             'table_name_for_import': 'New_table',
-                            'table_name_for_export': 'New_table'}
+                            'table_name_for_export': 'New_table',
+                            'incremental_import': '1'}
 
 excel_default_notations = {'file_path_for_import': 'New_table.xlsx',
                            'file_path_for_export': 'New_table.xlsx'}
@@ -44,6 +46,34 @@ def zero_to_false(s):
         return s
 
 
+def to_bool(value):
+    """
+    Read a flag saved in notations
+    :param value: bool, 0, 1 or String
+    :return: True for True, 1, '1' and 'True'
+    """
+    return str(value) in ('1', 'True')
+
+
+def with_backend(notations, backend='mysql'):
+    """
+    Add the storage backend to MySQL notations of an older version of the program.
+    The key goes before 'database', because the database entry must stay the last one in the config window
+    :param notations: dict
+    :param backend: String, 'mysql' or 'sqlite', see storage.py
+    :return: dict
+    """
+    if 'backend' in notations:
+        return notations
+    new_notations = {}
+    for key, value in notations.items():
+        if key == 'database':
+            new_notations['backend'] = backend
+        new_notations[key] = value
+    new_notations.setdefault('backend', backend)
+    return new_notations
+
+
 def to_bytes(notations):
     return {base64.urlsafe_b64encode(key.encode()): base64.urlsafe_b64encode(str(value).encode())
             for key, value in notations.items()}
@@ -205,6 +235,12 @@ class Loader:
             with open(self.config_file, 'rb') as conf:
                 configuration = pickle.load(conf)
                 self.mysql_notations, self.google_notations, self.excel_notations = decode_list(configuration)
+                if self.mysql_notations:
+                    # the options are added in new versions of the program
+                    self.mysql_notations = with_backend(self.mysql_notations)
+                if self.google_notations:
+                    self.google_notations.setdefault('incremental_import',
+                                                     google_default_notations['incremental_import'])
         if not configuration:
             configuration = [to_bytes(self.mysql_notations),
                              to_bytes(self.google_notations),
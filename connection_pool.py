@@ -0,0 +1,317 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import Queue, Empty, Full
+
+import mysql.connector
+from mysql.connector.errors import PoolError, OperationalError, InterfaceError
+
+from query_trace import record_connect
+
+# Client error codes which mean that the server has gone away and the connection must be reopened
+CONNECTION_LOST_ERRORS = (2006, 2013, 2055)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_TIMEOUT = 30
+DEFAULT_PING_INTERVAL = 60
+
+
+def is_connection_lost(error):
+    """
+    Check whether an error says that the connection to the server is lost
+    :param error: mysql.connector.Error
+    :return: True if the connection should be reopened
+    """
+    return isinstance(error, (OperationalError, InterfaceError)) and error.errno in CONNECTION_LOST_ERRORS
+
+
+class ConnectionPool:
+    """
+    A bounded pool of connections to one MySQL server with one config.
+
+    Connections are opened lazily up to pool size.
+    An idle connection is pinged before it is handed out if it was not used for ping_interval seconds.
+    A broken connection is discarded and a new one is opened instead.
+
+    Methods:
+    acquire,
+    release,
+    connection,
+    close,
+    stats
+    """
+
+    def __init__(self, config, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, ping_interval=DEFAULT_PING_INTERVAL):
+        """
+        Initialization
+        :param config: dict
+        configs required for mysql.connector, see my_sql_connector.query_database for details
+        :param size: int, maximum number of open connections
+        :param timeout: seconds to wait for a free connection before PoolError is raised
+        :param ping_interval: seconds of idleness after which a connection is checked before use
+        """
+        self.config = dict(config)
+        # the storage backend is chosen by my_sql_connector, mysql.connector does not know the key
+        self.config.pop('backend', None)
+        # an abandoned query generator must not block the connection with an unread result
+        self.config['consume_results'] = True
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._idle = Queue(maxsize=size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self._stats = {'created': 0,
+                       'checkouts': 0,
+                       'waits': 0,
+                       'wait_time': 0.0,
+                       'reconnects': 0,
+                       'discarded': 0,
+                       'connect_time': 0.0}
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _connect(self):
+        start = time.perf_counter()
+        cnx = mysql.connector.connect(**self.config)
+        seconds = time.perf_counter() - start
+        self._count('connect_time', seconds)
+        record_connect(seconds)
+        self._count('created')
+        cnx.pool_last_used = time.monotonic()
+        return cnx
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._open < self.size:
+                self._open += 1
+                return True
+        return False
+
+    def _free_slot(self):
+        with self._lock:
+            self._open -= 1
+
+    def _is_healthy(self, cnx):
+        if time.monotonic() - cnx.pool_last_used < self.ping_interval:
+            return True
+        try:
+            cnx.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self):
+        """
+        Take a connection from the pool.
+        Open a new one if the pool is not full, otherwise wait for a released connection.
+        :return: mysql.connector connection
+        """
+        if self._closed:
+            raise PoolError("Connection pool is closed")
+        try:
+            cnx = self._idle.get_nowait()
+        except Empty:
+            cnx = None
+        if cnx is None and self._reserve_slot():
+            try:
+                cnx = self._connect()
+            except Exception:
+                self._free_slot()
+                raise
+        if cnx is None:
+            self._count('waits')
+            start = time.perf_counter()
+            try:
+                cnx = self._idle.get(timeout=self.timeout)
+            except Empty:
+                raise PoolError("No free connection in the pool after {} s".format(self.timeout))
+            finally:
+                self._count('wait_time', time.perf_counter() - start)
+        if not self._is_healthy(cnx):
+            cnx = self._replace(cnx)
+        self._count('checkouts')
+        return cnx
+
+    def _replace(self, cnx):
+        """
+        Close a broken connection and open a new one in its slot
+        """
+        self._close_quietly(cnx)
+        self._count('reconnects')
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def reconnect(self, cnx):
+        """
+        Reopen a connection which is lost during a query
+        :param cnx: the connection taken by acquire()
+        :return: the same connection object
+        """
+        self._count('reconnects')
+        start = time.perf_counter()
+        cnx.reconnect(attempts=1)
+        seconds = time.perf_counter() - start
+        self._count('connect_time', seconds)
+        record_connect(seconds)
+        return cnx
+
+    def release(self, cnx, discard=False):
+        """
+        Return a connection to the pool
+        :param cnx: the connection taken by acquire()
+        :param discard: bool (default False). Close the connection instead of reuse
+        :return: None
+        """
+        if discard or self._closed:
+            self._close_quietly(cnx)
+            self._count('discarded')
+            self._free_slot()
+            return
+        cnx.pool_last_used = time.monotonic()
+        try:
+            self._idle.put_nowait(cnx)
+        except Full:
+            self._close_quietly(cnx)
+            self._free_slot()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager for a pooled connection.
+        Commit on success, roll back on error and return the connection to the pool anyway.
+        A lost connection is not returned to the pool.
+
+        >> with pool.connection() as cnx:
+        >>     cursor = cnx.cursor()
+        """
+        cnx = self.acquire()
+        discard = False
+        try:
+            yield cnx
+            cnx.commit()
+        except mysql.connector.Error as error:
+            discard = is_connection_lost(error)
+            if not discard:
+                self._rollback_quietly(cnx)
+            raise
+        except BaseException:
+            self._rollback_quietly(cnx)
+            raise
+        finally:
+            self.release(cnx, discard=discard)
+
+    @staticmethod
+    def _rollback_quietly(cnx):
+        try:
+            cnx.rollback()
+        except mysql.connector.Error:
+            pass
+
+    @staticmethod
+    def _close_quietly(cnx):
+        try:
+            cnx.close()
+        except mysql.connector.Error:
+            pass
+
+    def close(self):
+        """
+        Close all idle connections. Connections in use are closed when they are released.
+        :return: None
+        """
+        self._closed = True
+        while True:
+            try:
+                cnx = self._idle.get_nowait()
+            except Empty:
+                break
+            self._close_quietly(cnx)
+            self._free_slot()
+
+    def stats(self):
+        """
+        Pool counters for sizing the pool under load
+        :return: dict
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._open
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['open'] - stats['idle']
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pool_options = {'size': DEFAULT_POOL_SIZE,
+                 'timeout': DEFAULT_TIMEOUT,
+                 'ping_interval': DEFAULT_PING_INTERVAL}
+
+
+def config_key(config):
+    """
+    A hashable key for a config dict
+    :param config: dict
+    :return: tuple
+    """
+    return tuple(sorted((key, str(value)) for key, value in config.items()))
+
+
+def configure_pools(size=None, timeout=None, ping_interval=None):
+    """
+    Set options for the pools which will be created later
+    :param size: int, maximum number of connections per config
+    :param timeout: seconds to wait for a free connection
+    :param ping_interval: seconds of idleness after which a connection is checked before use
+    :return: dict with the current options
+    """
+    for key, value in (('size', size), ('timeout', timeout), ('ping_interval', ping_interval)):
+        if value is not None:
+            _pool_options[key] = value
+    return dict(_pool_options)
+
+
+def get_pool(config):
+    """
+    Return the shared pool for a config. Create it if needed.
+    :param config: dict, see my_sql_connector.query_database for details
+    :return: ConnectionPool
+    """
+    key = config_key(config)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(config, **_pool_options)
+            _pools[key] = pool
+    return pool
+
+
+def close_pools():
+    """
+    Close all pools, e.g. before the program exits
+    :return: None
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """
+    Statistics of all pools
+    :return: dict with database names (user@host/database) as the keys and ConnectionPool.stats() as the values
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {"{}@{}/{}".format(pool.config.get('user'), pool.config.get('host'),
+                              pool.config.get('database')): pool.stats() for pool in pools}
@@ -0,0 +1,27 @@
+from ancillary import export_row
+
+
+def stream_to_excel(batches, filename, progress=None):
+    """
+    Write rows to MS Excel file as they come. Memory usage does not depend on the number of rows,
+    because the workbook is opened in write-only mode
+    :param batches: iterable of lists of rows (Eng, engT, EngEx, Rus, RusEx),
+    e.g. my_sql_connector.query_batches(config, learn_new())
+    :param filename: path to the .xlsx file
+    :param progress: function (optional). It is called with the number of rows written after each batch
+    :return: number of rows which are written
+    """
+    # openpyxl is needed only for export, it is not imported on the start of the program
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Sheet1')
+    number = 0
+    for batch in batches:
+        for row in batch:
+            number += 1
+            sheet.append(export_row(number, row))
+        if progress is not None:
+            progress(number)
+    workbook.save(filename)
+    return number
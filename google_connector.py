@@ -1,7 +1,23 @@
+import hashlib
+import os
+import time
+
 import gspread
+from gspread.exceptions import APIError, SpreadsheetNotFound
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
 
+from ancillary import export_row
+
+# Rows written by one request of the export
+EXPORT_CHUNK_ROWS = 500
+# HTTP statuses of Google API which are worth a retry: quota exceeded and temporary server errors
+RETRY_STATUSES = (429, 500, 503)
+MAX_RETRIES = 5
+RETRY_DELAY = 1.0
+
+_clients = {}
+
 
 def connect_to_gspread(json_filename):
     """
@@ -19,6 +35,41 @@ def connect_to_gspread(json_filename):
     return gs
 
 
+def get_client(json_filename):
+    """
+    An authorized client which is shared by all calls with the same credentials file.
+    The client is authorized again only if the file is modified, and its token is refreshed when it expires
+    :param json_filename: credentials file
+    :return: an instance of type Client
+    """
+    path = os.path.abspath(json_filename)
+    mtime = os.path.getmtime(path)
+    cached = _clients.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, connect_to_gspread(json_filename))
+        _clients[path] = cached
+    client = cached[1]
+    if getattr(client.auth, 'access_token_expired', False):
+        client.login()
+    return client
+
+
+def with_retry(function, *args, **kwargs):
+    """
+    Call a Google API function. Retry with exponential backoff if the quota is exceeded
+    :param function: callable
+    :return: the result of function(*args, **kwargs)
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return function(*args, **kwargs)
+        except APIError as error:
+            status = getattr(getattr(error, 'response', None), 'status_code', None)
+            if status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                raise
+            time.sleep(RETRY_DELAY * 2 ** attempt)
+
+
 def load_table(json_filename, table_name):
     """
     load a table from google spreadsheets from sheet 1
@@ -26,12 +77,86 @@ def load_table(json_filename, table_name):
     :param table_name: String. A name of the table
     :return: pandas.DataFrame()
     """
-    gs = connect_to_gspread(json_filename)
+    gs = get_client(json_filename)
     w = gs.open(table_name).sheet1
     data = w.get_all_values()
     return pd.DataFrame(data, columns=None)
 
 
+def column_letter(number):
+    """
+    A1 notation of a column
+    :param number: int from 1
+    :return: String, e.g. 'A' for 1, 'AA' for 27
+    """
+    letters = ''
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def sheet_range(title, cells):
+    """
+    A1 notation of a range of a worksheet. A quote in the title is doubled, e.g. 'John''s words'!A1:G10
+    :param title: String, the title of the worksheet
+    :param cells: String, e.g. 'A1:G10'
+    :return: String
+    """
+    return "'{}'!{}".format(title.replace("'", "''"), cells)
+
+
+def row_hash(row):
+    """
+    A hash of a row of a spreadsheet. Trailing empty cells are ignored, because Google API omits them
+    :param row: list of String
+    :return: String
+    """
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+    return hashlib.md5('\x1f'.join(row).encode('utf-8')).hexdigest()
+
+
+def load_table_since(json_filename, table_name, sync=None, client=None):
+    """
+    Load the rows which are added to sheet 1 since the previous import.
+    Only the last row of the previous import and the rows below it are fetched.
+    The whole sheet is loaded if there is no previous import, if the last imported row is changed,
+    or if a new row is wider than the sheet was (the header shape is changed)
+    :param json_filename: Path to Google API credentials file .json
+    :param table_name: String. A name of the table
+    :param sync: dict returned by the previous call (optional)
+    :param client: gspread Client (optional, default get_client(json_filename))
+    :return: pandas.DataFrame() with the new rows,
+    dict with keys 'rows', 'last_row_hash', 'columns' for the next call,
+    and True if the whole sheet is loaded
+    """
+    if client is None:
+        client = get_client(json_filename)
+    worksheet = with_retry(client.open, table_name).sheet1
+    new_rows = None
+    if sync and sync['rows'] > 0:
+        cell_range = sheet_range(worksheet.title, "A{}:{}".format(sync['rows'], column_letter(worksheet.col_count)))
+        values = with_retry(worksheet.spreadsheet.values_get, cell_range).get('values', [])
+        if (values and row_hash(values[0]) == sync['last_row_hash']
+                and max(len(row) for row in values) <= sync['columns']):
+            new_rows = values[1:]
+            rows = sync['rows'] + len(new_rows)
+            columns = sync['columns']
+            last_row = values[-1]
+    full = new_rows is None
+    if full:
+        new_rows = with_retry(worksheet.get_all_values)
+        rows = len(new_rows)
+        columns = max((len(row) for row in new_rows), default=0)
+        last_row = new_rows[-1] if new_rows else []
+    new_rows = [row + [''] * (columns - len(row)) for row in new_rows]
+    return (pd.DataFrame(new_rows, columns=range(columns)),
+            {'rows': rows, 'last_row_hash': row_hash(last_row), 'columns': columns},
+            full)
+
+
 def reformat_table(table):
     """
     Reformat the table for export. Set the next format:
@@ -53,6 +178,7 @@ def reformat_table(table):
 
 def prepare_table_to_export(table):
     """
+    Obsoleted, see export_table()
     Prepare table for export to Google spreadsheet.
     Reformat pd.DataFrame() by reformat_table(table)
     Turn it into list of String (not list if lists)
@@ -69,6 +195,7 @@ def prepare_table_to_export(table):
 
 def save_table(json_filename, user_email, new_table, new_table_range, new_table_name="new_table", role='owner'):
     """
+    Obsoleted, see export_table()
     Save table to Google spreadsheets
     :param json_filename: Path to Google API credentials file .json
     :param user_email: An email referred to a google account with which the spreadsheets will be shared
@@ -88,6 +215,88 @@ def save_table(json_filename, user_email, new_table, new_table_range, new_table_
     return w
 
 
+def write_values(worksheet, values, start_row=1, chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    """
+    Write a block of values to a worksheet by chunks of rows
+    :param worksheet: gspread Worksheet
+    :param values: list of lists (rows) of the same length
+    :param start_row: int, the first row of the block from 1
+    :param chunk_rows: int, rows written by one request
+    :param progress: function (optional). It is called with the number of rows written after each request
+    :return: number of requests
+    """
+    if not values:
+        return 0
+    end_row = start_row + len(values) - 1
+    if worksheet.row_count < end_row:
+        with_retry(worksheet.add_rows, end_row - worksheet.row_count)
+    last_column = column_letter(len(values[0]))
+    requests = 0
+    for first in range(0, len(values), chunk_rows):
+        chunk = values[first:first + chunk_rows]
+        cell_range = sheet_range(worksheet.title, "A{}:{}{}".format(start_row + first,
+                                                                   last_column, start_row + first + len(chunk) - 1))
+        with_retry(worksheet.spreadsheet.values_update, cell_range,
+                   params={'valueInputOption': 'RAW'}, body={'values': chunk})
+        requests += 1
+        if progress is not None:
+            progress(first + len(chunk))
+    return requests
+
+
+def last_number(values):
+    """
+    The last number of a column, e.g. of the numbers of the words exported by export_table()
+    :param values: list of the values of the column
+    :return: int, 0 if there are no numbers
+    """
+    for value in reversed(values):
+        try:
+            return int(str(value).strip())
+        except ValueError:
+            continue
+    return 0
+
+
+def export_table(json_filename, user_email, rows, table_name="new_table", role='owner', append=False,
+                 chunk_rows=EXPORT_CHUNK_ROWS, client=None, progress=None):
+    """
+    Export rows to Google spreadsheets in the format of reformat_table(table)
+    :param json_filename: Path to Google API credentials file .json
+    :param user_email: An email referred to a google account with which a new spreadsheet will be shared
+    :param rows: list of rows (Eng, engT, EngEx, Rus, RusEx)
+    :param table_name: A name of the spreadsheet (optional, default="new_table")
+    :param role: user role (optional, default="owner". Also possible: "reader" and "writer")
+    :param append: bool (default False). Append the rows to an existing spreadsheet with the same name
+    and continue its numbering. A new spreadsheet is created if there is no such spreadsheet
+    :param chunk_rows: int, rows written by one request
+    :param client: gspread Client (optional, default get_client(json_filename))
+    :param progress: function (optional), see write_values()
+    :return: object. link to a table
+    """
+    if client is None:
+        client = get_client(json_filename)
+    spreadsheet = None
+    if append:
+        try:
+            spreadsheet = with_retry(client.open, table_name)
+        except SpreadsheetNotFound:
+            pass
+    if spreadsheet is None:
+        spreadsheet = with_retry(client.create, table_name)
+        with_retry(spreadsheet.share, user_email, perm_type='user', role=role)
+        start_row = 1
+        first_number = 1
+    else:
+        numbers = with_retry(spreadsheet.sheet1.col_values, 1)
+        start_row = len(numbers) + 1
+        # a header row or a note in column 1 is not a word
+        first_number = last_number(numbers) + 1
+    values = [export_row(first_number + i, row) for i, row in enumerate(rows)]
+    write_values(spreadsheet.sheet1, values, start_row, chunk_rows, progress)
+    return spreadsheet
+
+
 if __name__ == '__main__':
     filename = 'google_api.json'
     table_name_ = "Словарные слова"
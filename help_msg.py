@@ -17,6 +17,8 @@ def get_help():
             "data may be in an arbitrary order but they must contain:\nthe English word, transcription, English "
             "example, Russian word, and Russian example.\n"
             "  5. It is time to start the test. Select preferable type of test and enjoy!\n"
+            "In the 'Spaced repetition' mode the words which are due for review go first. Check spelling there: "
+            "your first answer for each word defines when the word will be shown again.\n"
             "  6. After the test you can upload the words into the google or excel spreadsheets.\n\n"
 
             "Have a fun:)")
@@ -1,20 +1,50 @@
+import time
+
+# the start of the program for the --startup-time mode
+START_TIME = time.perf_counter()
+
+import sqlite3
+import sys
 import tkinter as tk
 
 from tkinter import messagebox
 
-import OpenSSL
-from mysql.connector.errors import ProgrammingError, DatabaseError, InterfaceError
-from gspread.exceptions import SpreadsheetNotFound, APIError
-
-from ancillary import clear_text_data, add_newlines_to_row, desired_word
+from ancillary import clear_text_data, desired_word
 from card import CardWindowWidgets, Side
-from configs import ConfigWidgets, ExportImport
+from configs import ConfigWidgets, ExportImport, to_bool
+from excel_connector import stream_to_excel
 from help_msg import get_help
 from mainwindow import MainWindowWidgets
-from my_sql_connector import count_wellknown, count_new, random_rows, learn_new, query_database, \
-    from_within_last_n_days, learn_all, is_marked, mark_as_unlearned, mark_as_learned, create_database, create_table, \
-    modify_database, hide_word_forever, insert_rows, delete_doubles
-from table import Table
+from my_sql_connector import count_words, learn_new, query_database, create_database, create_table, \
+    modify_database, bulk_insert, upgrade_schema, query_batches
+import query_trace
+from scheduler import grade
+from session import fetch_cards, WordStateCache, SPACED_REPETITION
+from storage import close_backends, mysql_errors
+from table import Table, EmptySpreadsheetError
+from worker import TaskRunner, TaskCancelled
+
+# Modules which are needed only for import and export. table.Table and excel_connector import them on demand,
+# so they must not be loaded by the start of the program, see MainDriver.report_startup_time()
+DEFERRED_MODULES = ('pandas', 'numpy', 'sklearn', 'gspread', 'oauth2client', 'OpenSSL', 'openpyxl',
+                    'table_classifier', 'google_connector')
+
+
+class NotLoadedError(Exception):
+    """
+    Stands for the errors of a deferred module while it is not loaded. It is never raised
+    """
+
+
+def deferred_error(module, name):
+    """
+    An error class of a deferred module without importing it, see DEFERRED_MODULES.
+    If the module is not loaded (or not installed), none of its errors can be raised
+    :param module: String, e.g. 'gspread.exceptions'
+    :param name: String, e.g. 'APIError'
+    :return: the class or NotLoadedError
+    """
+    return getattr(sys.modules.get(module), name, NotLoadedError)
 
 
 class MainDriver:
@@ -22,7 +52,11 @@ class MainDriver:
         self.card_open = False
         self.config_open = False
         self.rows = None
+        self.current_id = None
         self.current_row = None
+        self.current_text = None
+        self.session_mode = None
+        self.word_states = WordStateCache()
         self.ok = True
         self.stat_correct = 0
         self.stat_wrong = 0
@@ -44,29 +78,19 @@ class MainDriver:
         self.conf = tk.Toplevel()
         self.conf.protocol("WM_DELETE_WINDOW", self.cancel_conf)
         self.conf_window = ConfigWidgets(master=self.conf)
+
+        # all queries, Google API requests and file operations run in the worker thread
+        self.runner = TaskRunner(self.root)
+        self.main_window.cancel_task_button["command"] = self.runner.cancel_all
+
+        # the config window stays open until the connection succeeds
+        self.conf_window.cancel_button.config(state='disabled')
         try:
-            self.apply_conf()
+            self.apply_conf(on_success=self.return_to_main_window)
         except KeyError:
             messagebox.showerror("Error", "Create a new user by new_user.py!")
             self.root.destroy()
 
-        try:
-            self.update_stat_labels()
-            self.conf.withdraw()
-            self.root.deiconify()
-        except ProgrammingError:
-            self.ok = False
-            self.conf_window.cancel_button.config(state='disabled')
-            self.root.withdraw()
-        except InterfaceError:
-            self.ok = False
-            self.conf_window.cancel_button.config(state='disabled')
-            self.root.withdraw()
-        except DatabaseError:
-            self.ok = False
-            self.conf_window.cancel_button.config(state='disabled')
-            self.root.withdraw()
-
         self.ei = tk.Toplevel()
         self.ei.protocol("WM_DELETE_WINDOW", self.cancel_dialog)
         self.ei_dialog = ExportImport(master=self.ei)
@@ -109,13 +133,8 @@ class MainDriver:
         self.ei.deiconify()
 
     def export_words(self):
-        config = self.conf_window.my_sql_frame.notations
         self.ei_dialog.flag_export = True
         self.ei_dialog.set_title()
-        rows = query_database(config, learn_new())
-        self.table.clear_table()
-        for row in rows:
-            self.table.add_row(row)
         self.root.withdraw()
         self.ei.deiconify()
 
@@ -128,7 +147,6 @@ class MainDriver:
     def open_cards(self):
         self.stat_correct = 0
         self.stat_wrong = 0
-        self.card_open = True
         self.table.clear_table()
         if not self.main_window.rb3.ch.get_ch_value():
             self.side_A.additional_instances = False
@@ -148,11 +166,28 @@ class MainDriver:
         self.main_window.specify_entry.delete(0, tk.END)
         self.main_window.specify_entry.insert(0, text)
 
-        # the section below for MySQL
+        parameters = self.set_training_mode()
+        self.session_mode = parameters[1]
+        self.run_task(lambda task, *args: fetch_cards(*args), *parameters,
+                      operation='open_cards',
+                      description="Loading words",
+                      on_done=lambda cards: self.start_cards(cards, text))
+
+    def start_cards(self, cards, text):
+        """
+        Show the first card of a session
+        :param cards: session.CardQueue
+        :param text: String, the number of questions from the main window
+        :return: None
+        """
+        self.card_open = True
         try:
-            self.rows, rows_length = self.set_training_mode()
-            self.current_row = next(self.rows)  # raise StopIteration
-            self.fill_side_labels(self.current_row)
+            self.rows, rows_length = cards, len(cards)
+            # the cards are fetched after the flush of the previous session, see flush_word_states()
+            self.word_states.reset()
+            self.word_states.load(cards.batch)
+            self.current_id, self.current_row, self.current_text = next(self.rows)  # raise StopIteration
+            self.fill_side_labels(self.current_text)
             self.card.deiconify()
             self.root.withdraw()
             if int(text) > rows_length:
@@ -163,7 +198,6 @@ class MainDriver:
             messagebox.showerror("Empty set",
                                  "It seems you have no words in selected mode to learn!\n"
                                  "Please check your database or choose another mode.")
-        # end section
 
         self.card_window.set_label_value(1, text)
 
@@ -185,13 +219,22 @@ class MainDriver:
                                                             self.conf_window.excel_frame.notations)
             self.conf_window.config_loader.remove_file()
             self.conf_window.config_loader.create_file()
-            self.root.destroy()
+            # stop an import or export and write the marks which are not saved yet
+            self.runner.cancel_all()
+            self.flush_word_states(operation='close_windows',
+                                   on_done=lambda updated: self.quit(), on_error=lambda error: self.quit())
         else:
             if self.card_open:
                 self.card.deiconify()
             else:
                 self.root.deiconify()
 
+    def quit(self):
+        self.runner.shutdown()
+        query_trace.log_summary()
+        close_backends()
+        self.root.destroy()
+
     # card window button's commands
     def flip(self):
         if self.side_A.does_it_enabled():
@@ -202,6 +245,10 @@ class MainDriver:
             self.side_B.disable()
 
     def next_card(self):
+        if self.session_mode == SPACED_REPETITION:
+            # a card without a typed answer (no spell check) is graded by its mark: a word marked as learned
+            # is known. A typed answer was recorded first and is kept, see WordStateCache.review()
+            self.word_states.review(self.current_id, grade(self.word_states.is_marked(self.current_id)))
         if self.side_B.does_it_enabled():
             self.side_A.enable()
             self.side_B.disable()
@@ -232,25 +279,19 @@ class MainDriver:
             self.close_cards()
         else:
             self.card_window.set_label_value(current_step, number_of_steps)
-            self.current_row = next(self.rows)
-            self.fill_side_labels(self.current_row)
+            self.current_id, self.current_row, self.current_text = next(self.rows)
+            self.fill_side_labels(self.current_text)
 
     def mark(self):
-        config = self.conf_window.my_sql_frame.notations
-        row = self.current_row
-        if is_marked(config, row):
-            mark_as_unlearned(config, row)
-            self.card_window.mark_button.config(text="Mark as learned")
-        else:
-            mark_as_learned(config, row)
+        if self.word_states.toggle_mark(self.current_id):
             self.card_window.mark_button.config(text="Mark as unlearned")
+        else:
+            self.card_window.mark_button.config(text="Mark as learned")
 
     def hide_forever(self):
         self.card.withdraw()
         if messagebox.askyesno("Word will be deleted", "This action cannot be undone!!!\nAre you sure?"):
-            config = self.conf_window.my_sql_frame.notations
-            row = self.current_row
-            hide_word_forever(config, row)
+            self.word_states.hide(self.current_id)
             self.next_card()
         self.card.deiconify()
 
@@ -266,6 +307,7 @@ class MainDriver:
         self.root.deiconify()
         self.card.withdraw()
         self.card_window.reset_step()
+        self.flush_word_states()
         self.update_stat_labels()
         self.update_side_a_label()
         if self.side_B.does_it_enabled():
@@ -277,12 +319,16 @@ class MainDriver:
         self.submit_flag = True
         true_eng_word = desired_word(self.current_row[0].lower())
         user_eng_word = self.side_A.e.get().lower().strip(" ")
-        if true_eng_word == user_eng_word:
+        correct = true_eng_word == user_eng_word
+        if correct:
             self.side_A.additional_val_label.set("Correct! Well done!")
             self.stat_correct += 1
         else:
             self.side_A.additional_val_label.set("Incorrect! Please try again.")
             self.stat_wrong += 1
+        if self.session_mode == SPACED_REPETITION:
+            # the first answer reschedules the word, see scheduler.next_state()
+            self.word_states.review(self.current_id, grade(correct))
 
     def submit_key(self, event):
         self.submit()
@@ -304,43 +350,65 @@ class MainDriver:
         self.conf_window.excel_frame.discard_values()
         self.conf_window.apply_button.config(state="disabled")
 
-    def apply_conf(self):
+    def apply_conf(self, on_success=None):
+        """
+        Save the values of the config window, upgrade the database and refresh the statistics.
+        The database is queried in the worker thread
+        :param on_success: function without arguments (optional). It is called if the connection succeeds
+        :return: None
+        """
         temp_config = self.conf_window.my_sql_frame.notations["database"]
         try:
             self.conf_window.my_sql_frame.save_values()
             self.conf_window.google_frame.save_values()
             self.conf_window.excel_frame.save_values()
-            self.update_stat_labels()
-            self.conf_window.cancel_button.config(state='normal')
-            self.ok = True
-        except ProgrammingError as error:
+        except TypeError as t_err:
+            self.conf_failed(t_err, temp_config)
+            return
+
+        def connect(task, config):
+            upgrade_schema(config)
+            task.check()
+            return count_words(config)
+
+        self.run_task(connect, dict(self.conf_window.my_sql_frame.notations),
+                      operation='apply_conf',
+                      description="Connecting to the database",
+                      on_done=lambda counts: self.conf_applied(counts, on_success),
+                      on_error=lambda error: self.conf_failed(error, temp_config))
+
+    def conf_applied(self, counts, on_success=None):
+        self.show_stat_labels(counts)
+        self.conf_window.cancel_button.config(state='normal')
+        self.ok = True
+        if on_success is not None:
+            on_success()
+
+    def conf_failed(self, error, temp_config):
+        self.ok = False
+        ProgrammingError, DatabaseError, InterfaceError = mysql_errors()
+        if isinstance(error, ProgrammingError):
             self.db_error(error, temp_config)
-            self.ok = False
-        except DatabaseError as db_err:
+        elif isinstance(error, (DatabaseError, InterfaceError)):
             self.conf.withdraw()
-            messagebox.showerror("Connection failed", db_err.msg)
+            messagebox.showerror("Connection failed", error.msg)
             self.conf.deiconify()
-            self.ok = False
-        except InterfaceError as i_err:
+        elif isinstance(error, (sqlite3.Error, ValueError)):
             self.conf.withdraw()
-            messagebox.showerror("Connection failed", i_err.msg)
+            messagebox.showerror("Connection failed", str(error))
             self.conf.deiconify()
-            self.ok = False
-        except TypeError as t_err:
+        elif isinstance(error, TypeError):
             self.conf.withdraw()
-            messagebox.showerror("Something wrong", t_err)
+            messagebox.showerror("Something wrong", error)
             self.conf.deiconify()
-            self.ok = False
+        elif not isinstance(error, TaskCancelled):
+            raise error
 
     def apply_button_pressed(self):
-        self.apply_conf()
-        if self.ok:
-            self.conf_window.apply_button.config(state="disabled")
+        self.apply_conf(on_success=lambda: self.conf_window.apply_button.config(state="disabled"))
 
     def ok_conf(self):
-        self.apply_conf()
-        if self.ok:
-            self.return_to_main_window()
+        self.apply_conf(on_success=self.return_to_main_window)
 
     def db_error(self, error, temp_config):
         if error.errno == 1049:
@@ -349,6 +417,12 @@ class MainDriver:
             self.conf.withdraw()
             messagebox.showerror("Access denied", error.msg)
             self.conf.deiconify()
+        elif error.errno == 1142:
+            self.conf.withdraw()
+            messagebox.showerror("Upgrade required", "The database is created by an older version of the program "
+                                                     "and you have no privileges to upgrade it.\n"
+                                                     "Please upgrade it by new_user.py.\n" + error.msg)
+            self.conf.deiconify()
         else:
             print(error)
 
@@ -357,27 +431,50 @@ class MainDriver:
         if messagebox.askyesno("Wrong database", "Database does not exist!\n"
                                                  "Would you like to create it?"):
             new_db_name = self.conf_window.my_sql_frame.entry_list[-1].get()
-            try:
-                create_database(self.conf_window.my_sql_frame.notations,
-                                new_db_name)
-                self.conf_window.my_sql_frame.notations["database"] = new_db_name
-                error_flag = True
-            except ProgrammingError:
-                self.conf.deiconify()
-                error_flag = False
-            try:
-                create_table(self.conf_window.my_sql_frame.notations, 'en_voc')
-                self.apply_conf()
-                messagebox.showinfo("Success", "Database '{}' and table 'en_voc' are created.".format(new_db_name))
-                self.return_to_main_window()
-            except ProgrammingError as p_err:
-                messagebox.showerror("Access denied", "Unable to create a table.\n" + p_err.msg)
-                if error_flag:
-                    modify_database(self.conf_window.my_sql_frame.notations, 'DROP DATABASE {};'.format(new_db_name))
-                self.abort_creation(db_name)
+            self.run_task(self.create_database_with_table, dict(self.conf_window.my_sql_frame.notations), new_db_name,
+                          description="Creating database '{}'".format(new_db_name),
+                          operation='wrong_database',
+                          on_done=self.database_created,
+                          on_error=lambda error: self.database_failed(error, db_name))
         else:
             self.abort_creation(db_name)
 
+    @staticmethod
+    def create_database_with_table(task, config, database_name):
+        """
+        Create a database with table 'en_voc'. Runs in the worker thread
+        :return: String, the name of the database
+        """
+        try:
+            create_database(dict(config), database_name)
+            created = True
+        except mysql_errors()[0]:
+            created = False
+        config['database'] = database_name
+        try:
+            create_table(config, 'en_voc')
+        except mysql_errors()[0]:
+            if created:
+                modify_database(config, 'DROP DATABASE {};'.format(database_name))
+            raise
+        return database_name
+
+    def database_created(self, database_name):
+        self.conf_window.my_sql_frame.notations["database"] = database_name
+
+        def success():
+            messagebox.showinfo("Success", "Database '{}' and table 'en_voc' are created.".format(database_name))
+            self.return_to_main_window()
+
+        self.apply_conf(on_success=success)
+
+    def database_failed(self, error, db_name):
+        if isinstance(error, mysql_errors()[0]):
+            messagebox.showerror("Access denied", "Unable to create a table.\n" + error.msg)
+        elif not isinstance(error, TaskCancelled):
+            messagebox.showerror("Something wrong", error)
+        self.abort_creation(db_name)
+
     def abort_creation(self, db_name):
         self.conf_window.my_sql_frame.entry_list[-1].delete(0, tk.END)
         self.conf_window.my_sql_frame.entry_list[-1].insert(0, db_name)
@@ -390,48 +487,83 @@ class MainDriver:
         self.conf.withdraw()
 
     # methods for database query
-    def update_stat_labels(self):
-        config = self.conf_window.my_sql_frame.notations
+    def run_task(self, function, *args, description='', operation=None, on_done=None, on_error=None,
+                 cancellable=True):
+        """
+        Run function(task, *args) in the worker thread and show it in the status line of the main window.
+        Callbacks are called in the main thread, see worker.TaskRunner.submit() for details
+        :param operation: String, the user action for query_trace, e.g. 'open_cards'
+        :return: worker.Task
+        """
+        def progress(rows):
+            self.main_window.set_status("{}: {} rows".format(description, rows))
 
-        self.main_window.wn_f.number = count_wellknown(config)
+        def finish(callback, value):
+            try:
+                if callback is not None:
+                    callback(value)
+                elif isinstance(value, BaseException) and not isinstance(value, TaskCancelled):
+                    raise value
+            finally:
+                if not self.runner.busy:
+                    self.main_window.set_idle("Cancelled" if isinstance(value, TaskCancelled) else "")
+
+        self.main_window.set_busy(description)
+        with query_trace.operation(operation or description):
+            return self.runner.submit(function, *args, description=description,
+                                      on_done=lambda result: finish(on_done, result),
+                                      on_error=lambda error: finish(on_error, error),
+                                      on_progress=progress,
+                                      cancellable=cancellable)
+
+    def show_stat_labels(self, counts):
+        self.main_window.wn_f.number, self.main_window.new_f.number = counts
         self.main_window.wn_f.refresh_label()
-
-        self.main_window.new_f.number = count_new(config)
         self.main_window.new_f.refresh_label()
 
         self.main_window.all_f.number = self.main_window.wn_f.number + self.main_window.new_f.number
         self.main_window.all_f.refresh_label()
 
+    def update_stat_labels(self):
+        self.run_task(lambda task, config: count_words(config), dict(self.conf_window.my_sql_frame.notations),
+                      operation='update_stat_labels',
+                      description="Counting words",
+                      on_done=self.show_stat_labels)
+
+    def flush_word_states(self, operation='close_cards', on_done=None, on_error=None):
+        """
+        Write the marks and hidden words of the session to the database in the worker thread.
+        The Cancel button does not stop it, so the marks are not lost
+        :return: None
+        """
+        config = dict(self.conf_window.my_sql_frame.notations)
+        self.run_task(lambda task: self.word_states.flush(config),
+                      operation=operation,
+                      description="Saving the progress",
+                      on_done=on_done,
+                      on_error=on_error,
+                      cancellable=False)
+
     def set_training_mode(self):
         """
-        Set the training mode which is specified in the second radio button frame
-        :return: Generator with MySQL queries and its length
+        Read the training mode which is specified in the second radio button frame
+        :return: tuple with the arguments of session.fetch_cards()
         """
-        config = self.conf_window.my_sql_frame.notations
+        config = dict(self.conf_window.my_sql_frame.notations)
         limit = int(clear_text_data(self.main_window.specify_entry.get()))
         try:
             days = int(self.main_window.custom_entry.get())
         except ValueError:
             days = 0
             self.main_window.custom_entry.insert(0, '0')
-        if self.main_window.rb2.v.get() == 0:
-            rows = query_database(config, random_rows(learn_new(), limit))
-            rows_length = sum(1 for _ in query_database(config, random_rows(learn_new(), limit)))
-        elif self.main_window.rb2.v.get() == 1:
-            rows = query_database(config, random_rows(from_within_last_n_days(30), limit))
-            rows_length = sum(1 for _ in query_database(config, random_rows(from_within_last_n_days(30), limit)))
-        elif self.main_window.rb2.v.get() == 2:
-            rows = query_database(config, random_rows(from_within_last_n_days(days), limit))
-            rows_length = sum(1 for _ in query_database(config, random_rows(from_within_last_n_days(days), limit)))
-        elif self.main_window.rb2.v.get() == 3:
-            rows = query_database(config, random_rows(learn_all(), limit))
-            rows_length = sum(1 for _ in query_database(config, random_rows(learn_all(), limit)))
-        else:
-            raise ValueError
-        return rows, rows_length
+        return config, self.main_window.rb2.v.get(), limit, days
 
-    def fill_side_labels(self, in_row):
-        row = add_newlines_to_row(in_row, 60)  # alter the int if the text is too wide
+    def fill_side_labels(self, row):
+        """
+        Show a card
+        :param row: the texts of the card wrapped by add_newlines_to_row(), see session.CardQueue
+        :return: None
+        """
         if self.main_window.rb1.v.get() == 0 and self.main_window.rb3.v.get() == 0:
             # return 0  # Words, Eng->Rus
             self.side_A.val_label[0].set(row[0])
@@ -523,7 +655,7 @@ class MainDriver:
         else:
             raise ValueError
 
-        if is_marked(self.conf_window.my_sql_frame.notations, in_row):
+        if self.word_states.is_marked(self.current_id):
             self.card_window.mark_button.config(text="Mark as unlearned")
         else:
             self.card_window.mark_button.config(text="Mark as learned")
@@ -534,83 +666,146 @@ class MainDriver:
         self.close_cards()
 
     def ok_dialog(self):
-        msg = 'Some error is occurred!'
         self.ei.withdraw()
-        flag = True
-        table = None
+        self.ei_dialog.rb.save_values()
+        self.table.update_google_notations(self.conf_window.google_frame.notations)
+        self.table.update_excel_notations(self.conf_window.excel_frame.notations)
         if self.ei_dialog.rb.v.get() == 1 and self.ei_dialog.flag_export:
-            try:
-                self.table.update_google_notations(self.conf_window.google_frame.notations)
-                num_of_words = self.table.google_export()
-                msg = ("Congrats! {} rows have been written in "
-                       " {} to account {}").format(num_of_words,
-                                                   self.table.google_notations["table_name_for_export"],
-                                                   self.table.google_notations["user_email"])
-            except APIError as e:
-                messagebox.showerror("APIError", e)
-                flag = False
+            job, description = self.export_to_google, "Exporting to Google Sheets"
         elif self.ei_dialog.rb.v.get() == 2 and self.ei_dialog.flag_export:
-            self.table.update_excel_notations(self.conf_window.excel_frame.notations)
-            try:
-                num_of_words = self.table.excel_export()
-                msg = ("Congrats! {} rows have been written in "
-                       " {}").format(num_of_words, self.table.excel_notations["file_path_for_export"])
-            except PermissionError as err:
-                flag = False
-                if err.errno == 13:
-                    messagebox.showerror("Permission denied", "Perhaps the file is already open.")
-                else:
-                    print(err)
+            job, description = self.export_to_excel, "Exporting to Excel"
         elif self.ei_dialog.rb.v.get() == 1 and not self.ei_dialog.flag_export:
-            self.table.update_google_notations(self.conf_window.google_frame.notations)
-            try:
-                table = self.table.google_import()
-                msg = ("Congrats! Items have been successfully "
-                       "imported from {}".format(self.table.google_notations["table_name_for_import"]))
-            except SpreadsheetNotFound:
-                self.ei.withdraw()
-                flag = False
-                messagebox.showerror("Error", "Spreadsheet not found")
-            except FileNotFoundError:
-                self.ei.withdraw()
-                flag = False
-                messagebox.showerror("Error", "Your .json is not found!")
-            except OpenSSL.crypto.Error:
-                self.ei.withdraw()
-                flag = False
-                messagebox.showerror("Error", "The problem with your .json is occurred!")
-
+            job, description = self.import_from_google, "Importing from Google Sheets"
         elif self.ei_dialog.rb.v.get() == 2 and not self.ei_dialog.flag_export:
-            self.table.update_excel_notations(self.conf_window.excel_frame.notations)
-            table, not_recognized, errors = self.table.excel_import()
-            msg = ("Congrats! Items have been successfully "
-                   "imported from {} with {} not recognized "
-                   "sheets which are: {}.".format(self.table.excel_notations["file_path_for_import"],
-                                                  len(not_recognized),
-                                                  not_recognized))
+            job, description = self.import_from_excel, "Importing from Excel"
         else:
             raise UserWarning("Something wrong!")
+        self.root.deiconify()
+        self.run_task(job, dict(self.conf_window.my_sql_frame.notations),
+                      operation='ok_dialog',
+                      description=description,
+                      on_done=self.dialog_done,
+                      on_error=self.dialog_failed)
+
+    # Export and import jobs. They run in the worker thread and must not touch the widgets
+    def export_to_google(self, task, config):
+        self.table.clear_table()
+        for row in query_database(config, learn_new()):
+            self.table.add_row(row)
+        task.check()
+        num_of_words = self.table.google_export(progress=task.report)
+        return ("Congrats! {} rows have been written in "
+                " {} to account {}").format(num_of_words,
+                                            self.table.google_notations["table_name_for_export"],
+                                            self.table.google_notations["user_email"])
+
+    def export_to_excel(self, task, config):
+        num_of_words = stream_to_excel(query_batches(config, learn_new()),
+                                       self.table.excel_notations["file_path_for_export"],
+                                       progress=task.report)
+        return ("Congrats! {} rows have been written in "
+                " {}").format(num_of_words, self.table.excel_notations["file_path_for_export"])
+
+    def import_from_google(self, task, config):
+        incremental = to_bool(self.table.google_notations.get("incremental_import", False))
+        table = self.table.google_import(incremental=incremental)
+        if incremental and table.empty:
+            return "There are no new rows in {}.".format(self.table.google_notations["table_name_for_import"])
+        msg = ("Congrats! Items have been successfully "
+               "imported from {}".format(self.table.google_notations["table_name_for_import"]))
+        msg = self.store_table(task, config, table, msg)
+        self.table.commit_sync()
+        return msg
+
+    def import_from_excel(self, task, config):
+        table, not_recognized, errors = self.table.excel_import()
+        msg = ("Congrats! Items have been successfully "
+               "imported from {} with {} not recognized "
+               "sheets which are: {}.\n{} sheets were read in {:.1f} s.".format(
+                   self.table.excel_notations["file_path_for_import"],
+                   len(not_recognized),
+                   not_recognized,
+                   len(self.table.sheet_timings),
+                   sum(self.table.sheet_timings.values())))
+        return self.store_table(task, config, table, msg)
+
+    @staticmethod
+    def store_table(task, config, table, msg):
+        """
+        Insert an imported table into the database. A cancelled insert is rolled back
+        :return: String, the message with the insert speed
+        """
+        if table.empty:
+            raise EmptySpreadsheetError("No words are recognized in the spreadsheet")
+        task.check()
+        report = bulk_insert(config, table.values.tolist(), progress=task.report)
+        return msg + "\n{} rows were written at {:.0f} rows/s.".format(report['rows'], report['rows_per_second'])
+
+    def dialog_done(self, msg):
+        messagebox.showinfo("Success!", msg)
+        self.close_cards()
 
-        if not self.ei_dialog.flag_export and table is not None:
-            config = self.conf_window.my_sql_frame.notations
-            try:
-                insert_rows(config, table.values.tolist())
-                delete_doubles(config)
-            except ValueError:
-                self.ei.withdraw()
-                messagebox.showerror("Error", "The spreadsheet is empty!")
-                flag = False
-
-        if flag:
-            messagebox.showinfo("Success!", msg)
-        self.ei_dialog.rb.save_values()
+    def dialog_failed(self, error):
+        # gspread and OpenSSL are not imported here: a missing package must not replace the error reported
+        if isinstance(error, TaskCancelled):
+            pass
+        elif isinstance(error, deferred_error('gspread.exceptions', 'APIError')):
+            messagebox.showerror("APIError", error)
+        elif isinstance(error, PermissionError):
+            if error.errno == 13:
+                messagebox.showerror("Permission denied", "Perhaps the file is already open.")
+            else:
+                print(error)
+        elif isinstance(error, deferred_error('gspread.exceptions', 'SpreadsheetNotFound')):
+            messagebox.showerror("Error", "Spreadsheet not found")
+        elif isinstance(error, FileNotFoundError):
+            if self.ei_dialog.rb.v.get() == 1:
+                messagebox.showerror("Error", "Your .json is not found!")
+            else:
+                messagebox.showerror("Error", "File {} is not found!".format(error.filename))
+        elif isinstance(error, deferred_error('OpenSSL.crypto', 'Error')):
+            messagebox.showerror("Error", "The problem with your .json is occurred!")
+        elif isinstance(error, EmptySpreadsheetError):
+            messagebox.showerror("Error", "The spreadsheet is empty!")
+        elif isinstance(error, ValueError):
+            messagebox.showerror("Error", "{}: {}".format(type(error).__name__, error))
+        else:
+            self.close_cards()
+            raise error
         self.close_cards()
 
     # other
     def launch(self):
         self.main_window.mainloop()
 
+    def report_startup_time(self):
+        """
+        The --startup-time mode. Print the time from the start of the program to the first idle of the event loop,
+        the time to the end of the connection to the database (the main window is shown then)
+        and the deferred modules which are loaded. Then exit
+        """
+        ready = time.perf_counter() - START_TIME
+
+        def wait_for_connection():
+            if self.runner.busy:
+                self.root.after(10, wait_for_connection)
+                return
+            connected = time.perf_counter() - START_TIME
+            loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+            print("The event loop is ready in {:.3f} s, the database is connected in {:.3f} s.\n"
+                  "Deferred modules loaded: {}".format(ready, connected, ", ".join(loaded) or "none"))
+            self.quit()
+
+        wait_for_connection()
+
 
 if __name__ == '__main__':
+    # language_training.pyw --trace writes slow queries and the statistics of the database calls
+    # to query_trace.SLOW_QUERY_LOG
+    if '--trace' in sys.argv:
+        query_trace.enable()
     main_window = MainDriver()
+    # python language_training.pyw --startup-time prints the start time of the program and exits
+    if '--startup-time' in sys.argv:
+        main_window.root.after_idle(main_window.report_startup_time)
     main_window.launch()
@@ -35,11 +35,13 @@ class MainWindowWidgets(tk.Frame):
         self.custom_frame = tk.LabelFrame(self, text="Specify the custom time period in days:",
                                           fg="snow3")
         self.button_frame = tk.Frame(self)
+        self.status_frame = tk.Frame(self)
         self.export_frame.grid(row=0, column=0, columnspan=3, padx=5, sticky=tk.EW)
         self.radio_frame.grid(row=2, column=0, columnspan=3, padx=5, sticky=tk.EW)
         self.specify_frame.grid(row=3, column=0, columnspan=3, padx=5, sticky=tk.EW)
         self.custom_frame.grid(row=4, column=0, columnspan=3, padx=5, sticky=tk.EW)
         self.button_frame.grid(row=5, column=0, columnspan=3, padx=5, sticky=tk.E)
+        self.status_frame.grid(row=6, column=0, columnspan=3, padx=5, sticky=tk.EW)
 
         self.import_button = tk.Button(self.export_frame, text='Import words', width=10)
         self.export_button = tk.Button(self.export_frame, text='Export words', width=10)
@@ -66,7 +68,8 @@ class MainWindowWidgets(tk.Frame):
             ("Learn new", 0),
             ("Repeat learned in the past month", 1),
             ("Repeat learned in a custom period", 2),
-            ("Learn all", 3)
+            ("Learn all", 3),
+            ("Spaced repetition", 4)
         ]
 
         notations_rb3 = [
@@ -102,6 +105,42 @@ class MainWindowWidgets(tk.Frame):
         self.help_button.pack(side='left', padx=5, pady=5)
         self.exit_button.pack(side='left', pady=5)
 
+        self.status_v = tk.StringVar()
+        self.status_label = tk.Label(self.status_frame, textvariable=self.status_v, anchor=tk.W, width=30)
+        self.cancel_task_button = tk.Button(self.status_frame, text="Cancel", width=10, state='disabled')
+        self.status_label.pack(side='left', fill=tk.X, expand=True)
+        self.cancel_task_button.pack(side='right', pady=5)
+
+    def set_status(self, text):
+        """
+        Show a message in the status line
+        :param text: String
+        :return: None
+        """
+        self.status_v.set(text)
+
+    def set_busy(self, text):
+        """
+        Disable the buttons which start database or file operations while a background task runs
+        :param text: String, a description of the task
+        :return: None
+        """
+        self.set_status(text)
+        for button in (self.import_button, self.export_button, self.preferences_button, self.start_button):
+            button.config(state='disabled')
+        self.cancel_task_button.config(state='normal')
+
+    def set_idle(self, text=''):
+        """
+        Enable the buttons after all background tasks are finished
+        :param text: String, the final message
+        :return: None
+        """
+        self.set_status(text)
+        for button in (self.import_button, self.export_button, self.preferences_button, self.start_button):
+            button.config(state='normal')
+        self.cancel_task_button.config(state='disabled')
+
     def radio_callback(self, var):
         if var == 2:
             self.custom_entry.config(state="normal")
@@ -1,9 +1,106 @@
-import mysql.connector
+import hashlib
+import random
+import time
+from datetime import date
+from math import isnan
+
+from query_trace import record_query
+from storage import get_backend, backend_name, is_missing_table, BACKEND_SQLITE
+
+# Rows per executemany() call. Each chunk must fit into max_allowed_packet of the server
+DEFAULT_CHUNK_SIZE = 500
+
+# Tables with a smaller id range and selections of fewer rows are sampled with ORDER BY RAND(). It is cheap for them
+SAMPLE_FULL_SORT_IDS = 5000
+SAMPLE_MAX_ROUNDS = 6
+SAMPLE_MAX_PROBES = 5000
+# Older SQLite builds allow at most 999 parameters in a query: the ids probed by random_sample()
+# and the keys looked up by bulk_insert() in one query of an SQLite database
+SQLITE_MAX_VARIABLES = 999
+
+# Columns selected for a card and for export
+WORD_COLUMNS = "Eng, engT, EngEx, Rus, RusEx"
+# Columns selected for a training session: the primary key and the state of the word go first
+SESSION_COLUMNS = "id, wellknown, " + WORD_COLUMNS
+
+# Migrations of the schema of table en_voc as (version, steps).
+# The version of a database is stored in table schema_version.
+# A step is (kind, name, statement): the statement is skipped if the 'column' or the 'index' of table en_voc
+# with this name already exists, so a migration which failed partway is run again from the step which failed.
+# The statements of the steps with kind None can be run again as they are.
+# Append new migrations to the end and never change the applied ones
+SCHEMA_MIGRATIONS = [
+    (1, (('index', 'visible_wellknown_marked',
+          "ALTER TABLE en_voc ADD INDEX visible_wellknown_marked (visible, wellknown, marked);"),
+         ('index', 'eng_prefix', "ALTER TABLE en_voc ADD INDEX eng_prefix (Eng(64));"),
+         ('index', 'rus_prefix', "ALTER TABLE en_voc ADD INDEX rus_prefix (Rus(64));"))),
+    # eng_key is word_key(Eng). The unique key rejects doubles on insert instead of delete_doubles()
+    (2, (('column', 'eng_key', "ALTER TABLE en_voc ADD COLUMN eng_key CHAR(32) NULL;"),
+         (None, None, "UPDATE en_voc SET eng_key = MD5(LOWER(TRIM(Eng)));"),
+         # one grouping pass keeps the last row of each word. A self-join on eng_key has no index here yet
+         (None, None, "DELETE FROM en_voc WHERE eng_key IS NOT NULL AND id NOT IN "
+                      "(SELECT id FROM (SELECT MAX(id) AS id FROM en_voc GROUP BY eng_key) AS last_rows);"),
+         ('index', 'eng_key', "ALTER TABLE en_voc ADD UNIQUE INDEX eng_key (eng_key);"))),
+    # the state of spaced repetition, see scheduler.py. due is NULL for the words which were never reviewed
+    (3, (('column', 'ease', "ALTER TABLE en_voc ADD COLUMN ease FLOAT NOT NULL DEFAULT 2.5;"),
+         ('column', 'reps', "ALTER TABLE en_voc ADD COLUMN reps INT NOT NULL DEFAULT 0;"),
+         ('column', 'interval_days', "ALTER TABLE en_voc ADD COLUMN interval_days INT NOT NULL DEFAULT 0;"),
+         ('column', 'due', "ALTER TABLE en_voc ADD COLUMN due DATE NULL;"),
+         ('index', 'visible_due', "ALTER TABLE en_voc ADD INDEX visible_due (visible, due);"))),
+    # complete marks the words with all five texts, so the statistics are counted from one index
+    (4, (('column', 'complete',
+          "ALTER TABLE en_voc "
+          "ADD COLUMN complete TINYINT(1) AS (Eng IS NOT NULL AND EngT IS NOT NULL AND EngEx IS NOT NULL "
+          "AND Rus IS NOT NULL AND RusEx IS NOT NULL) STORED;"),
+         ('index', 'visible_complete_wellknown',
+          "ALTER TABLE en_voc ADD INDEX visible_complete_wellknown (visible, complete, wellknown);"))),
+]
+# Count the columns and the indexes of table en_voc with a name, see SCHEMA_MIGRATIONS
+SCHEMA_OBJECT_QUERIES = {
+    'column': "SELECT COUNT(*) FROM information_schema.COLUMNS "
+              "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'en_voc' AND COLUMN_NAME = %s;",
+    'index': "SELECT COUNT(*) FROM information_schema.STATISTICS "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'en_voc' AND INDEX_NAME = %s;",
+}
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+# The schema of table en_voc in an SQLite database. It is the schema of SCHEMA_VERSION,
+# because a file database is always created by this program and never shared with an older version.
+# Add the changes of new migrations here
+SQLITE_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS `{0}` ("
+    "`id` INTEGER PRIMARY KEY AUTOINCREMENT, "
+    "`Eng` TEXT, "
+    "`engT` TEXT, "
+    "`EngEx` TEXT, "
+    "`Rus` TEXT, "
+    "`RusEx` TEXT, "
+    "`wellknown` INTEGER NOT NULL DEFAULT 0, "
+    "`marked` DATE NOT NULL DEFAULT '1980-01-01', "
+    "`unmarked` DATE NOT NULL DEFAULT '1980-01-01', "
+    "`added` DATE NOT NULL, "
+    "`visible` INTEGER NOT NULL DEFAULT 1, "
+    "`eng_key` CHAR(32) NULL, "
+    "`ease` REAL NOT NULL DEFAULT 2.5, "
+    "`reps` INTEGER NOT NULL DEFAULT 0, "
+    "`interval_days` INTEGER NOT NULL DEFAULT 0, "
+    "`due` DATE NULL, "
+    "`complete` INTEGER AS (Eng IS NOT NULL AND EngT IS NOT NULL AND EngEx IS NOT NULL "
+    "AND Rus IS NOT NULL AND RusEx IS NOT NULL) STORED);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS eng_key ON `{0}` (eng_key);",
+    "CREATE INDEX IF NOT EXISTS visible_wellknown_marked ON `{0}` (visible, wellknown, marked);",
+    "CREATE INDEX IF NOT EXISTS eng_prefix ON `{0}` (Eng);",
+    "CREATE INDEX IF NOT EXISTS rus_prefix ON `{0}` (Rus);",
+    "CREATE INDEX IF NOT EXISTS visible_due ON `{0}` (visible, due);",
+    "CREATE INDEX IF NOT EXISTS visible_complete_wellknown ON `{0}` (visible, complete, wellknown);",
+)
 
 
 def query_database(config, query, *parameter_tuple):
     """
     Generator for queries to a database in MySQL server
+    The connection is taken from the pool shared by all functions with the same config
+    and returned to the pool when the generator is exhausted or closed.
     :param config: dict
     configs required for mysql.connector
     For instance, {'user': 'my_user',
@@ -11,6 +108,9 @@ def query_database(config, query, *parameter_tuple):
                   'host': 'localhost',
                   'use_pure': False,
                   'database': 'english'}
+    The optional key 'backend' selects the storage, see storage.py:
+    'mysql' (default) or 'sqlite'. An SQLite database is the file named by 'database',
+    the other keys are not used then
     :param query: String
     A query e.g. "SELECT * FROM table"
 
@@ -21,16 +121,57 @@ def query_database(config, query, *parameter_tuple):
     :return:
     generator
     """
-    cnx = mysql.connector.connect(**config)
-    cursor = cnx.cursor()
-    cursor.execute(query, parameter_tuple)
-    for c in cursor:
-        yield c
-    cnx.commit()
-    cursor.close()
+    backend = get_backend(config)
+    with backend.connection() as cnx:
+        start = time.perf_counter()
+        cursor = backend.execute(cnx, query, parameter_tuple)
+        seconds = time.perf_counter() - start
+        rows = 0
+        try:
+            for c in cursor:
+                rows += 1
+                yield c
+        finally:
+            cursor.close()
+            # the time of fetching is not traced, because it includes the work of the caller on each row
+            record_query('query', query, seconds, rows)
+
+
+def query_batches(config, query, batch_size=DEFAULT_CHUNK_SIZE, parameters=()):
+    """
+    Generator of the results of a query by batches.
+    The rows are read from the server as they are consumed, so the result is never held in memory at once
+    :param config: dict
+    see query_database(config, query) for details
 
+    :param query: String
+    :param batch_size: int, number of rows in a batch
+    :param parameters: tuple (optional)
+    see query_database(config, query) for details
 
-def modify_database(config, query):
+    :return:
+    generator of lists of rows
+    """
+    backend = get_backend(config)
+    with backend.connection() as cnx:
+        start = time.perf_counter()
+        cursor = backend.execute(cnx, query, parameters)
+        seconds = time.perf_counter() - start
+        number = 0
+        try:
+            rows = cursor.fetchmany(batch_size)
+            while rows:
+                number += len(rows)
+                yield rows
+                start = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                seconds += time.perf_counter() - start
+        finally:
+            cursor.close()
+            record_query('batches', query, seconds, number)
+
+
+def modify_database(config, query, *parameter_tuple):
     """
     Function for queries to a database in MySQL server
     It allows do all possible queries like ALTER, UPDATE, CREATE, etc
@@ -39,13 +180,18 @@ def modify_database(config, query):
 
     :param query: String
     a query like "ALTER...", "UPDATE...", "CREATE...", etc
+
+    :param parameter_tuple: tuple (optional)
+    see query_database(config, query) for details
     :return: True if done
     """
-    cnx = mysql.connector.connect(**config)
-    cursor = cnx.cursor()
-    cursor.execute(query)
-    cnx.commit()
-    cursor.close()
+    backend = get_backend(config)
+    start = time.perf_counter()
+    with backend.connection() as cnx:
+        cursor = backend.execute(cnx, query, parameter_tuple)
+        rows = cursor.rowcount
+        cursor.close()
+    record_query('modify', query, time.perf_counter() - start, max(rows, 0))
     return True
 
 
@@ -62,6 +208,10 @@ def create_database(config, database_name):
     a single word, e.g. 'english'
     :return: True if done
     """
+    if backend_name(config) == BACKEND_SQLITE:
+        # the file is created on the first connection
+        config['database'] = database_name
+        return True
     try:
         del config['database']
     except KeyError:
@@ -81,6 +231,9 @@ def create_table(config, table_name):
     a single word, e.g. 'en_voc'
     :return: True if done
     """
+    if backend_name(config) == BACKEND_SQLITE:
+        _create_sqlite_schema(config, table_name)
+        return True
     tab_creation_query = ("CREATE TABLE IF NOT EXISTS `{}` "
                           "(`id` INT(11) AUTO_INCREMENT, PRIMARY KEY (`id`), "
                           "`Eng` TEXT, "
@@ -93,10 +246,202 @@ def create_table(config, table_name):
                           "`unmarked` DATE NOT NULL DEFAULT '1980-01-01', "
                           "`added` DATE NOT NULL,"
                           "`visible` TINYINT(1) NOT NULL DEFAULT 1);").format(table_name)
-    return modify_database(config, tab_creation_query)
+    modify_database(config, tab_creation_query)
+    upgrade_schema(config)
+    return True
+
+
+def schema_version(config):
+    """
+    Get the version of the schema of table en_voc
+    :param config:  dict
+    see query_database(config, query) for details
+    :return: int, 0 for a table created before the migrations were introduced
+    """
+    try:
+        row = next(query_database(config, "SELECT version FROM schema_version;"), None)
+    except Exception as error:
+        if is_missing_table(error):
+            return 0
+        raise
+    return 0 if row is None else row[0]
+
+
+def schema_object_exists(config, kind, name):
+    """
+    Check whether table en_voc of a MySQL database has a column or an index
+    :param config:  dict
+    see query_database(config, query) for details
+    :param kind: String, 'column' or 'index'
+    :param name: String, the name of the column or the index
+    :return: bool
+    """
+    return next(query_database(config, SCHEMA_OBJECT_QUERIES[kind], name))[0] > 0
+
+
+def upgrade_schema(config):
+    """
+    Apply the migrations from SCHEMA_MIGRATIONS which are newer than the version of the database.
+    The steps whose column or index already exists are skipped, see SCHEMA_MIGRATIONS.
+    The user needs CREATE, ALTER and INDEX privileges if the database is outdated
+    :param config:  dict
+    see query_database(config, query) for details
+    :return: int, the new version of the schema
+    """
+    version = schema_version(config)
+    if version >= SCHEMA_VERSION:
+        return version
+    if backend_name(config) == BACKEND_SQLITE:
+        return _create_sqlite_schema(config, 'en_voc')
+    if version == 0:
+        modify_database(config, "CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL);")
+        modify_database(config, "INSERT INTO schema_version (version) VALUES (0);")
+    for migration_version, steps in SCHEMA_MIGRATIONS:
+        if migration_version <= version:
+            continue
+        for kind, name, statement in steps:
+            if kind is None or not schema_object_exists(config, kind, name):
+                modify_database(config, statement)
+        modify_database(config, "UPDATE schema_version SET version = %s;", migration_version)
+        version = migration_version
+    return version
+
+
+def _create_sqlite_schema(config, table_name):
+    """
+    Create table en_voc of SQLITE_SCHEMA and its indexes in one transaction
+    :return: int, SCHEMA_VERSION
+    """
+    backend = get_backend(config)
+    with backend.connection() as cnx:
+        for statement in SQLITE_SCHEMA:
+            backend.execute(cnx, statement.format(table_name)).close()
+        backend.execute(cnx, "CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL);").close()
+        backend.execute(cnx, "DELETE FROM schema_version;").close()
+        backend.execute(cnx, "INSERT INTO schema_version (version) VALUES (%s);", (SCHEMA_VERSION,)).close()
+    return SCHEMA_VERSION
 
 
 #  The functions for insert data:
+def _null_if_nan(value):
+    """
+    pandas marks empty cells with NaN. Store them as NULL
+    """
+    if isinstance(value, float) and isnan(value):
+        return None
+    return value
+
+
+def word_key(word):
+    """
+    A key of a word for finding doubles. It matches MD5(LOWER(TRIM(Eng))) in MySQL
+    :param word: String or None
+    :return: String, 32 hex digits or None
+    """
+    if word is None:
+        return None
+    return hashlib.md5(str(word).strip(' ').lower().encode('utf-8')).hexdigest()
+
+
+def _prepare_row(row, added):
+    eng, eng_t, eng_ex, rus, rus_ex = (_null_if_nan(value) for value in row)
+    return eng, eng_t, eng_ex, rus, rus_ex, added, word_key(eng)
+
+
+def bulk_insert(config, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Insert rows into a table with a prepared statement.
+    Rows are sent by chunks with executemany() inside one transaction,
+    so the values need no escaping and the query never exceeds max_allowed_packet.
+    The keys of the English words of a chunk are looked up first. Only the new words are inserted,
+    so they take the next ids without gaps. A row with an English word which is already in the table
+    updates the texts of that word and keeps its learning state, so no doubles appear.
+    :param config:
+    see query_database(config, query) for details
+
+    :param rows: an iterable of lists or tuples of format
+    ('Eng', 'engT', 'EngEx', 'Rus', 'RusEx')
+
+    :param chunk_size: int, number of rows sent to the server at once
+    :param progress: function (optional). It is called with the number of rows sent after each chunk.
+    An exception raised by it rolls back the whole insert
+    :return: dict with keys 'rows', 'chunks', 'seconds', 'rows_per_second'
+    """
+    today = date.today()
+    rows = [_prepare_row(row, today) for row in rows]
+    if not rows:
+        raise ValueError("There are no rows to insert")
+    # executemany() sends a chunk as one multi-row INSERT only if VALUES contains nothing but placeholders
+    insert_query = ("INSERT INTO en_voc(Eng, engT, EngEx, Rus, RusEx, added, eng_key) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s)")
+    update_query = "UPDATE en_voc SET Eng = %s, engT = %s, EngEx = %s, Rus = %s, RusEx = %s WHERE eng_key = %s"
+    start = time.perf_counter()
+    chunks = 0
+    backend = get_backend(config)
+    key_batch = SQLITE_MAX_VARIABLES if backend.name == BACKEND_SQLITE else chunk_size
+    with backend.connection() as cnx:
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            chunk_start = time.perf_counter()
+            new_rows, updates = _split_chunk(chunk, _existing_keys(backend, cnx, chunk, key_batch))
+            if new_rows:
+                backend.executemany(cnx, insert_query, new_rows)
+            if updates:
+                backend.executemany(cnx, update_query, updates)
+            record_query('executemany', insert_query, time.perf_counter() - chunk_start, len(chunk))
+            chunks += 1
+            if progress is not None:
+                progress(min(i + chunk_size, len(rows)))
+    seconds = time.perf_counter() - start
+    return {'rows': len(rows),
+            'chunks': chunks,
+            'seconds': seconds,
+            'rows_per_second': len(rows) / seconds if seconds > 0 else float('inf')}
+
+
+def _existing_keys(backend, cnx, rows, batch_size):
+    """
+    The keys of the English words of prepared rows which are already in the table.
+    The keys are looked up in the connection of the insert, so the words inserted by its previous chunks are found
+    :param rows: list of tuples returned by _prepare_row()
+    :param batch_size: int, keys looked up by one query
+    :return: set of String
+    """
+    keys = list({row[-1] for row in rows if row[-1] is not None})
+    existing = set()
+    for i in range(0, len(keys), batch_size):
+        batch, placeholders = _id_list(keys[i:i + batch_size])
+        cursor = backend.execute(cnx, "SELECT eng_key FROM en_voc WHERE eng_key IN ({});".format(placeholders),
+                                 batch)
+        existing.update(key for key, in cursor.fetchall())
+        cursor.close()
+    return existing
+
+
+def _split_chunk(rows, existing):
+    """
+    Split prepared rows into the new words and the updates of the words which are in the table.
+    Of several rows with the same word the last one is kept, as an update of the earlier ones would do
+    :param rows: list of tuples returned by _prepare_row()
+    :param existing: set of the keys which are in the table, see _existing_keys()
+    :return: list of rows to insert, list of tuples (Eng, engT, EngEx, Rus, RusEx, eng_key) to update
+    """
+    new_rows = []
+    positions = {}
+    updates = {}
+    for row in rows:
+        key = row[-1]
+        if key in existing:
+            updates[key] = row[:5] + (key,)
+        elif key in positions:
+            new_rows[positions[key]] = row
+        else:
+            if key is not None:
+                positions[key] = len(new_rows)
+            new_rows.append(row)
+    return new_rows, list(updates.values())
+
+
 def insert_rows(config, rows):
     """
     Insert one or more rows into a table
@@ -107,17 +452,18 @@ def insert_rows(config, rows):
     ('Eng', 'engT', 'EngEx', 'Rus', 'RusEx', 'added')
     :return: True if done
     """
-    values = ''
-    for row in rows:
-        eng, eng_t, eng_ex, rus, rus_ex = row
-        values = values + '("{}", "{}", "{}", "{}", "{}", CURDATE()), '.format(eng, eng_t, eng_ex, rus, rus_ex)
-    query = ("INSERT INTO en_voc(Eng, engT, EngEx, Rus, RusEx, added) "
-             "VALUES ") + values
-    query = query[:-2] + ";"
-    return modify_database(config, query)
+    bulk_insert(config, rows)
+    return True
 
 
 def delete_doubles(config):
+    """
+    Obsoleted
+    Doubles are rejected on insert by the unique key eng_key, see bulk_insert(config, rows)
+    :param config: dict
+    see query_database(config, query) for details
+    :return: True if done
+    """
     query = ("DELETE t1 FROM en_voc t1 "
              "INNER JOIN en_voc t2 "
              "WHERE "
@@ -129,47 +475,111 @@ def delete_doubles(config):
 # The functions for the second radio button field of main window
 
 
-def learn_new():
+def learn_new(columns=WORD_COLUMNS):
     """
     Specify a query for new words
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
     :return: String
     MySQL query
     """
-    return ("SELECT Eng, engT, EngEx, Rus, RusEx FROM en_voc "
+    return ("SELECT {} FROM en_voc "
             "WHERE wellknown = 0 AND visible = 1 "
             "AND Eng is NOT NULL "
             "AND EngT IS NOT NULL "
             "AND EngEx IS NOT NULL "
             "AND Rus IS NOT NULL "
-            "AND RusEx IS NOT NULL;")
+            "AND RusEx IS NOT NULL;").format(columns)
 
 
-def from_within_last_n_days(n):
+def from_within_last_n_days(n, columns=WORD_COLUMNS):
     """
     Specify a query for words which marked as learned within past n days
     :param n: int
     number of days
 
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
     :return: String
     MySQL query
     """
-    return ("SELECT Eng, engT, EngEx, Rus, RusEx FROM en_voc "
+    return ("SELECT {} FROM en_voc "
             "WHERE wellknown = 1 AND visible = 1 AND DATE_SUB(CURDATE(), "
-            "INTERVAL {} DAY) <= marked;").format(n)
+            "INTERVAL {} DAY) <= marked;").format(columns, n)
 
 
-def learn_all():
+def learn_all(columns=WORD_COLUMNS):
     """
     Specify a query for all words
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
     :return: String
     MySQL query
     """
-    return ("SELECT Eng, engT, EngEx, Rus, RusEx FROM en_voc WHERE visible = 1 "
+    return ("SELECT {} FROM en_voc WHERE visible = 1 "
             "AND Eng is NOT NULL "
             "AND EngT IS NOT NULL "
             "AND EngEx IS NOT NULL "
             "AND Rus IS NOT NULL "
-            "AND RusEx IS NOT NULL;")
+            "AND RusEx IS NOT NULL;").format(columns)
+
+
+def due_for_review(limit, columns=WORD_COLUMNS):
+    """
+    Specify a query for the words which are due for review, the most overdue first.
+    The query is a range scan of index visible_due, so its cost depends on the limit and not on the table size
+    :param limit: int
+    number of rows required
+
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
+    :return: String
+    MySQL query
+    """
+    return ("SELECT {} FROM en_voc "
+            "WHERE visible = 1 AND due <= CURDATE() "
+            "AND Eng is NOT NULL "
+            "AND EngT IS NOT NULL "
+            "AND EngEx IS NOT NULL "
+            "AND Rus IS NOT NULL "
+            "AND RusEx IS NOT NULL "
+            "ORDER BY due LIMIT {};").format(columns, limit)
+
+
+def never_reviewed(limit, columns=WORD_COLUMNS):
+    """
+    Specify a query for the words which were never reviewed in the order they were added
+    :param limit: int
+    number of rows required
+
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
+    :return: String
+    MySQL query
+    """
+    return ("SELECT {} FROM en_voc "
+            "WHERE visible = 1 AND due IS NULL "
+            "AND Eng is NOT NULL "
+            "AND EngT IS NOT NULL "
+            "AND EngEx IS NOT NULL "
+            "AND Rus IS NOT NULL "
+            "AND RusEx IS NOT NULL "
+            "ORDER BY id LIMIT {};").format(columns, limit)
+
+
+def review_batch(config, limit, columns=WORD_COLUMNS):
+    """
+    Select the words for a spaced repetition session: the due words first, then the words never reviewed
+    :param config: dict
+    see query_database(config, query) for details
+
+    :param limit: int
+    number of rows required
+
+    :param columns: String, selected columns (optional, default WORD_COLUMNS)
+    :return: list of rows
+    """
+    if limit <= 0:
+        return []
+    rows = list(query_database(config, due_for_review(limit, columns)))
+    if len(rows) < limit:
+        rows.extend(query_database(config, never_reviewed(limit - len(rows), columns)))
+    return rows
 
 
 def repeat_within_arbitrary_interval():
@@ -198,11 +608,106 @@ def random_rows(query, limit):
     return query.replace(";", " ") + "ORDER BY RAND() LIMIT {};".format(limit)
 
 
+def add_condition(query, condition):
+    """
+    Add a condition to the WHERE clause of a query
+    :param query: String
+    specific MySQL query with WHERE clause
+
+    :param condition: String, e.g. "id > 5"
+    :return: String
+    MySQL query
+    """
+    return query.replace(";", " ") + "AND {};".format(condition)
+
+
+def count_rows(config, query, at_most):
+    """
+    Count the rows selected by a query, but not more than at_most.
+    The count stops at the limit, so its cost does not depend on the number of the rows selected
+    :param config: dict
+    see query_database(config, query) for details
+    :param query: String, a SELECT query without LIMIT, e.g. learn_new()
+    :param at_most: int
+    :return: int
+    """
+    count_query = "SELECT COUNT(*) FROM ({} LIMIT {}) AS selected;".format(query.rstrip().rstrip(';'), at_most)
+    return next(query_database(config, count_query))[0]
+
+
+def random_sample(config, query, limit):
+    """
+    Return random rows selected by a query without sorting the whole table.
+    Random ids between MIN(id) and MAX(id) are probed through the primary key.
+    Every id is probed at most once, so each matching row has the same chance to be selected.
+    The number of probes is adapted to the share of ids which satisfy the query.
+    Small tables and too sparse selections are sampled by random_rows(query, limit).
+    A selection of few rows, e.g. fewer than limit, is found by a count which stops after SAMPLE_FULL_SORT_IDS rows
+    and is sampled by random_rows() at once, without probing.
+    :param config: dict
+    see query_database(config, query) for details
+
+    :param query: String
+    specific MySQL query with WHERE clause, e.g. learn_new()
+
+    :param limit: int
+    number of rows required
+
+    :return: list of rows in random order
+    """
+    # two subqueries: SQLite reads MIN and MAX from the primary key only if each is selected alone
+    low, high = next(query_database(config, "SELECT (SELECT MIN(id) FROM en_voc), (SELECT MAX(id) FROM en_voc);"))
+    if low is None or limit <= 0:
+        return []
+    span = high - low + 1
+    if span <= SAMPLE_FULL_SORT_IDS or count_rows(config, query, SAMPLE_FULL_SORT_IDS + 1) <= SAMPLE_FULL_SORT_IDS:
+        return list(query_database(config, random_rows(query, limit)))
+
+    max_probes = SQLITE_MAX_VARIABLES if backend_name(config) == BACKEND_SQLITE else SAMPLE_MAX_PROBES
+    rows = []
+    probed = set()
+    hit_rate = 1.0
+    for _ in range(SAMPLE_MAX_ROUNDS):
+        missing = limit - len(rows)
+        if missing <= 0 or len(probed) >= span:
+            break
+        number = min(int(missing * 1.5 / hit_rate) + 1, max_probes, span - len(probed))
+        candidates = random.sample(range(low, high + 1), min(span, number + len(probed)))
+        ids = [i for i in candidates if i not in probed][:number]
+        probed.update(ids)
+        probe_query = add_condition(query, "id IN ({})".format(", ".join(["%s"] * len(ids))))
+        found = list(query_database(config, probe_query, *ids))
+        rows.extend(found)
+        hit_rate = max(len(found) / len(ids), 1 / SAMPLE_MAX_PROBES)
+
+    if len(rows) < limit:
+        # the query selects only a few rows of the table
+        return list(query_database(config, random_rows(query, limit)))
+    random.shuffle(rows)
+    return rows[:limit]
+
+
 # Functions for StatLabel
 
 
+def count_words(config):
+    """
+    Count wellknown and new words in table by one query.
+    The query reads index visible_complete_wellknown only
+    :param config: dict
+    see query_database(config, query) for details
+    :return: tuple of int (number of wellknown words, number of new words)
+    Words with NULL values are not counted.
+    """
+    query = ("SELECT COALESCE(SUM(wellknown = 1), 0), COALESCE(SUM(wellknown = 0), 0) FROM en_voc "
+             "WHERE visible = 1 AND complete = 1;")
+    wellknown, new = next(query_database(config, query))
+    return int(wellknown), int(new)
+
+
 def count_wellknown(config):
     """
+    Not used. See count_words(config)
     Count wellknown words in table
     :param config: dict
     see query_database(config, query) for details
@@ -221,6 +726,7 @@ def count_wellknown(config):
 
 def count_new(config):
     """
+    Not used. See count_words(config)
     Count new words in table
     :param config: dict
     see query_database(config, query) for details
@@ -239,36 +745,102 @@ def count_new(config):
 
 # Functions for mark and unmark words
 
-def is_marked(config, row):
+def is_marked(config, word_id):
     """
     Check whether the word is marked
     :param config: dict
     see query_database(config, query) for details
-    :param row: tuple
-    (Eng, EngT, EngEx, Rus, RusEx)
+    :param word_id: int, primary key of the word
     :return: True if word is marked as wellknown. False otherwise
     """
-    query = ('SELECT wellknown FROM en_voc WHERE Eng = "{}" '
-             'AND Rus = "{}" AND visible = 1;').format(row[0], row[3])
-    return next(query_database(config, query))[0] == 1
+    query = 'SELECT wellknown FROM en_voc WHERE id = %s AND visible = 1;'
+    return next(query_database(config, query, word_id))[0] == 1
+
 
+def _id_list(ids):
+    ids = list(ids)
+    return ids, ", ".join(["%s"] * len(ids))
 
-def mark_as_learned(config, row):
+
+def mark_as_learned(config, ids):
+    """
+    Mark words as wellknown
+    :param config: dict
+    see query_database(config, query) for details
+    :param ids: iterable of int, primary keys of the words
+    :return: True if done
+    """
+    ids, placeholders = _id_list(ids)
+    if not ids:
+        return True
     query = ('UPDATE en_voc SET wellknown = 1, marked = CURDATE() '
-             'WHERE Eng = "{}" AND Rus = "{}" AND visible = 1;').format(row[0], row[3])
-    return modify_database(config, query)
+             'WHERE id IN ({}) AND visible = 1;').format(placeholders)
+    return modify_database(config, query, *ids)
 
 
-def mark_as_unlearned(config, row):
+def mark_as_unlearned(config, ids):
+    """
+    Mark words as new
+    :param config: dict
+    see query_database(config, query) for details
+    :param ids: iterable of int, primary keys of the words
+    :return: True if done
+    """
+    ids, placeholders = _id_list(ids)
+    if not ids:
+        return True
     query = ('UPDATE en_voc SET wellknown = 0, unmarked = CURDATE() '
-             'WHERE Eng = "{}" AND Rus = "{}" AND visible = 1;').format(row[0], row[3])
-    return modify_database(config, query)
+             'WHERE id IN ({}) AND visible = 1;').format(placeholders)
+    return modify_database(config, query, *ids)
 
 
-def hide_word_forever(config, row):
-    query = ('UPDATE en_voc SET visible = 0 '
-             'WHERE Eng = "{}" AND Rus = "{}";').format(row[0], row[3])
-    return modify_database(config, query)
+def hide_word_forever(config, ids):
+    """
+    Never show words again
+    :param config: dict
+    see query_database(config, query) for details
+    :param ids: iterable of int, primary keys of the words
+    :return: True if done
+    """
+    ids, placeholders = _id_list(ids)
+    if not ids:
+        return True
+    query = 'UPDATE en_voc SET visible = 0 WHERE id IN ({});'.format(placeholders)
+    return modify_database(config, query, *ids)
+
+
+def schedule_states(config, ids):
+    """
+    Get the spaced repetition state of words
+    :param config: dict
+    see query_database(config, query) for details
+    :param ids: iterable of int, primary keys of the words
+    :return: list of tuples (id, ease, reps, interval_days)
+    """
+    ids, placeholders = _id_list(ids)
+    if not ids:
+        return []
+    query = 'SELECT id, ease, reps, interval_days FROM en_voc WHERE id IN ({});'.format(placeholders)
+    return list(query_database(config, query, *ids))
+
+
+def update_schedule(config, rows):
+    """
+    Write the spaced repetition state of words in one transaction
+    :param config: dict
+    see query_database(config, query) for details
+    :param rows: list of tuples (ease, reps, interval_days, due, id)
+    :return: True if done
+    """
+    if not rows:
+        return True
+    query = 'UPDATE en_voc SET ease = %s, reps = %s, interval_days = %s, due = %s WHERE id = %s;'
+    backend = get_backend(config)
+    start = time.perf_counter()
+    with backend.connection() as cnx:
+        backend.executemany(cnx, query, rows)
+    record_query('executemany', query, time.perf_counter() - start, len(rows))
+    return True
 
 
 def undo_hiding_forever_for_all(config):
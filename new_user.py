@@ -1,9 +1,8 @@
 import os
 from getpass import getpass
 
-from mysql.connector.errors import ProgrammingError, DatabaseError, InterfaceError
 from configs import Loader
-from my_sql_connector import modify_database, create_database, create_table
+from my_sql_connector import modify_database, create_database, create_table, upgrade_schema
 
 
 def is_email(s):
@@ -36,9 +35,7 @@ def create_new_user(username, password, host='localhost'):
     create_table(config, 'en_voc')
     modify_database(config, "CREATE USER '{}'@'{}' "
                             "IDENTIFIED BY '{}';".format(username, host, password))
-    query = ("GRANT SELECT, INSERT, UPDATE, DELETE "
-             "ON {}.* TO '{}'@'{}';").format(database_name, username, host)
-    modify_database(config, query)
+    grant_privileges(config, database_name, username, host)
     config['user'] = username
     config['password'] = password
     config['host'] = host
@@ -46,14 +43,65 @@ def create_new_user(username, password, host='localhost'):
     return config
 
 
-def new_account(conf_filename, email, password, host='localhost', google_table='New_table'):
-    my_sql_config = create_new_user(username=get_username(email),
-                                    password=password,
-                                    host=host)
+def grant_privileges(config, database_name, username, host='localhost'):
+    """
+    Grant the privileges required by the program.
+    CREATE, ALTER and INDEX allow the program to upgrade the schema of the database
+    """
+    query = ("GRANT SELECT, INSERT, UPDATE, DELETE, CREATE, ALTER, INDEX "
+             "ON {}.* TO '{}'@'{}';").format(database_name, username, host)
+    return modify_database(config, query)
+
+
+def upgrade_database(database_name, username=None, host='localhost'):
+    """
+    Upgrade the schema of an existing user database in place with admin privileges
+    :param database_name: String, e.g. 'user_db'
+    :param username: String (optional). Grant the user the privileges required for further upgrades
+    :param host: String
+    :return: int, the new version of the schema
+    """
+    config = get_admin_config()
+    config['database'] = database_name
+    version = upgrade_schema(config)
+    if username:
+        grant_privileges(config, database_name, username, host)
+    return version
+
+
+def create_local_database(filename):
+    """
+    Create an SQLite database for a single user. Neither MySQL server nor admin privileges are required
+    :param filename: String, path to the database file, e.g. 'user_db.sqlite3'
+    :return: dict, the config of the database
+    """
+    config = {'user': '',
+              'password': '',
+              'host': '',
+              'use_pure': False,
+              'backend': 'sqlite',
+              'database': filename}
+    create_table(config, 'en_voc')
+    return config
+
+
+def new_account(conf_filename, email, password, host='localhost', google_table='New_table', local_database=None):
+    """
+    Create a user and save the configs of the program
+    :param local_database: String (optional). Path to an SQLite database file which is used instead of MySQL server
+    """
+    if local_database:
+        my_sql_config = create_local_database(local_database)
+    else:
+        my_sql_config = create_new_user(username=get_username(email),
+                                        password=password,
+                                        host=host)
+        my_sql_config['backend'] = 'mysql'
     google_config = {'your_json_file': 'google_api.json',
                      'user_email': email,
                      'table_name_for_import': google_table,
-                     'table_name_for_export': 'New_table'}
+                     'table_name_for_export': 'New_table',
+                     'incremental_import': '1'}
     excel_config = {'file_path_for_import': 'test_table.xlsx',
                     'file_path_for_export': 'New_table.xlsx'}
     loader = Loader(mysql_notations=my_sql_config,
@@ -64,6 +112,22 @@ def new_account(conf_filename, email, password, host='localhost', google_table='
 
 
 if __name__ == '__main__':
+    config_filename = 'new_user/config.pickle'
+    google_table_ = 'Словарные слова'
+    if input("Would you like to keep the words in a local SQLite file instead of MySQL server (y/n)? ")[:1] == 'y':
+        email_ = input("\nEnter user email: ")
+        local_database_ = input("Database file (default user_db.sqlite3): ") or 'user_db.sqlite3'
+        if os.path.exists(config_filename):
+            os.remove(config_filename)
+        new_account(config_filename, email_, '', google_table=google_table_, local_database=local_database_)
+        print('\nNew account has been created.\n\nMove {} and {} '
+              'to the work directory to apply new user credentials'.format(config_filename, local_database_))
+        input("\n\nPress enter to exit...")
+        raise SystemExit
+
+    # a MySQL server from here on, an SQLite account above does not need mysql-connector
+    from mysql.connector.errors import ProgrammingError, DatabaseError, InterfaceError
+
     question = input("Would you like to specify MySQL config with admin privileges (y/n)? ")
     if question == '':
         question == 'n'
@@ -79,10 +143,18 @@ if __name__ == '__main__':
         loader.create_file()
         print("File admin.pickle was created. Delete it later.")
 
+    if input("\nWould you like to upgrade an existing user database (y/n)? ")[:1] == 'y':
+        database_ = input("Database: ")
+        try:
+            print("Database {} is upgraded to version {}.".format(database_, upgrade_database(
+                database_, username=input("User (leave empty to keep privileges): "))))
+        except (DatabaseError, InterfaceError) as err:
+            print(err)
+        input("\n\nPress enter to exit...")
+        raise SystemExit
+
     email_ = input("\nEnter user email: ")
     password_ = getpass(prompt='Set user password: ', stream=None)
-    google_table_ = 'Словарные слова'
-    config_filename = 'new_user/config.pickle'
     if password_ == getpass(prompt='Repeat user password: ', stream=None):
         if os.path.exists(config_filename):
             os.remove(config_filename)
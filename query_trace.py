@@ -0,0 +1,209 @@
+import logging
+import re
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Upper bounds of the latency histogram buckets, ms. The last bucket has no upper bound
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+SLOW_QUERY_LOG = 'slow_queries.log'
+SLOW_QUERY_SECONDS = 0.1
+# Queries are cut in the log to this length
+MAX_QUERY_LENGTH = 300
+
+logger = logging.getLogger('query_trace')
+logger.propagate = False
+
+_operation = ContextVar('operation', default=None)
+_lock = threading.Lock()
+_state = {'enabled': False,
+          'slow_seconds': SLOW_QUERY_SECONDS,
+          'handler': None}
+_stats = {}
+
+
+def enable(log_filename=SLOW_QUERY_LOG, slow_seconds=SLOW_QUERY_SECONDS):
+    """
+    Start recording the database calls. Tracing is off by default
+    :param log_filename: path to the file for the slow query log and the summaries
+    :param slow_seconds: float, the queries which take longer are written to the log
+    :return: None
+    """
+    disable()
+    handler = logging.FileHandler(log_filename, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    with _lock:
+        _state['handler'] = handler
+        _state['slow_seconds'] = slow_seconds
+        _state['enabled'] = True
+
+
+def disable():
+    """
+    Stop recording and close the log file. The statistics are kept until reset()
+    :return: None
+    """
+    with _lock:
+        handler = _state['handler']
+        _state['handler'] = None
+        _state['enabled'] = False
+    if handler is not None:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+def reset():
+    """
+    Forget the statistics
+    :return: None
+    """
+    with _lock:
+        _stats.clear()
+
+
+@contextmanager
+def operation(name):
+    """
+    Context manager which assigns the database calls to a user action, e.g. 'open_cards'.
+    The name follows the tasks submitted to worker.TaskRunner inside the context
+
+    >> with operation('open_cards'):
+    >>     runner.submit(...)
+    """
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def current_operation():
+    """
+    :return: String, the name of the current operation or None
+    """
+    return _operation.get()
+
+
+def _entry(name, kind):
+    key = (name or 'unknown', kind)
+    entry = _stats.get(key)
+    if entry is None:
+        entry = {'calls': 0,
+                 'rows': 0,
+                 'seconds': 0.0,
+                 'max': 0.0,
+                 'histogram': [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)}
+        _stats[key] = entry
+    return entry
+
+
+def _add(kind, seconds, rows):
+    with _lock:
+        entry = _entry(_operation.get(), kind)
+        entry['calls'] += 1
+        entry['rows'] += rows
+        entry['seconds'] += seconds
+        entry['max'] = max(entry['max'], seconds)
+        entry['histogram'][bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+
+def short_query(query):
+    """
+    A query in one line for the log
+    :param query: String
+    :return: String
+    """
+    query = re.sub(r'\s+', ' ', query).strip()
+    if len(query) > MAX_QUERY_LENGTH:
+        query = query[:MAX_QUERY_LENGTH] + '...'
+    return query
+
+
+def record_query(kind, query, seconds, rows=0):
+    """
+    Record a database call. Does nothing if tracing is off
+    :param kind: String, e.g. 'query', 'modify', 'executemany'
+    :param query: String
+    :param seconds: float, time of the call without the time spent by the caller on the rows
+    :param rows: int, rows returned or sent
+    :return: None
+    """
+    if not _state['enabled']:
+        return
+    _add(kind, seconds, rows)
+    if seconds >= _state['slow_seconds']:
+        logger.info("SLOW %.1f ms operation=%s kind=%s rows=%d %s", seconds * 1000, _operation.get(), kind, rows,
+                    short_query(query))
+
+
+def record_connect(seconds):
+    """
+    Record the time of opening a connection. Does nothing if tracing is off
+    :param seconds: float
+    :return: None
+    """
+    if _state['enabled']:
+        _add('connect', seconds, 0)
+
+
+def percentile(histogram, share):
+    """
+    The upper bound of the histogram bucket which contains a percentile
+    :param histogram: list of counts, see HISTOGRAM_BOUNDS_MS
+    :param share: float, e.g. 0.95
+    :return: float, ms. inf for the last bucket
+    """
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    count = 0
+    for bound, number in zip(HISTOGRAM_BOUNDS_MS + (float('inf'),), histogram):
+        count += number
+        if count >= share * total:
+            return float(bound)
+    return float('inf')
+
+
+def summary():
+    """
+    Statistics of the database calls by operation and kind
+    :return: dict with tuples (operation, kind) as the keys and dicts as the values with keys
+    'calls', 'rows', 'seconds', 'max', 'histogram', 'p50_ms', 'p95_ms'
+    """
+    with _lock:
+        result = {key: dict(entry, histogram=list(entry['histogram'])) for key, entry in _stats.items()}
+    for entry in result.values():
+        entry['p50_ms'] = percentile(entry['histogram'], 0.5)
+        entry['p95_ms'] = percentile(entry['histogram'], 0.95)
+    return result
+
+
+def format_summary():
+    """
+    A table of summary() sorted by the total time
+    :return: String
+    """
+    lines = ["{:<20} {:<12} {:>7} {:>9} {:>10} {:>8} {:>8} {:>9}".format(
+        'operation', 'kind', 'calls', 'rows', 'total ms', 'p50 ms', 'p95 ms', 'max ms')]
+    for (name, kind), entry in sorted(summary().items(), key=lambda item: -item[1]['seconds']):
+        lines.append("{:<20} {:<12} {:>7} {:>9} {:>10.1f} {:>8} {:>8} {:>9.1f}".format(
+            name, kind, entry['calls'], entry['rows'], entry['seconds'] * 1000,
+            '<={:g}'.format(entry['p50_ms']), '<={:g}'.format(entry['p95_ms']), entry['max'] * 1000))
+    return "\n".join(lines)
+
+
+def log_summary():
+    """
+    Write format_summary() to the log file
+    :return: None
+    """
+    if _state['enabled']:
+        logger.info("SUMMARY\n%s", format_summary())
+
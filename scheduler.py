@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+
+from my_sql_connector import schedule_states, update_schedule
+
+# Quality of an answer in SM-2 terms: 0 - complete blackout, 5 - perfect response.
+# An answer below QUALITY_PASS starts the repetitions of the word from the beginning
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+QUALITY_PASS = 3
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+
+def grade(correct):
+    """
+    Quality of an answer typed on the card, or of a card without a typed answer by its mark
+    :param correct: bool, the answer is correct or the word is marked as learned
+    :return: int, QUALITY_CORRECT or QUALITY_WRONG
+    """
+    return QUALITY_CORRECT if correct else QUALITY_WRONG
+
+
+def next_state(ease, reps, interval_days, quality):
+    """
+    SM-2 algorithm: the state of a word after a review
+    https://www.supermemo.com/en/archives1990-2015/english/ol/sm2
+
+    :param ease: float, easiness factor of the word (2.5 for a new word)
+    :param reps: int, number of successful reviews in a row
+    :param interval_days: int, the previous interval between reviews
+    :param quality: int from 0 to 5
+    :return: tuple (ease, reps, interval_days)
+    """
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < QUALITY_PASS:
+        return ease, 0, 1
+    reps += 1
+    if reps == 1:
+        interval_days = 1
+    elif reps == 2:
+        interval_days = 6
+    else:
+        interval_days = int(round(interval_days * ease))
+    return ease, reps, interval_days
+
+
+def apply_reviews(config, reviews, today=None):
+    """
+    Reschedule reviewed words. The states are read by one query and written by one executemany()
+    :param config: dict
+    see my_sql_connector.query_database(config, query) for details
+    :param reviews: dict with word ids as the keys and the quality of the answers as the values
+    :param today: datetime.date (optional, default today)
+    :return: int, number of words rescheduled
+    """
+    if not reviews:
+        return 0
+    if today is None:
+        today = date.today()
+    rows = []
+    for word_id, ease, reps, interval_days in schedule_states(config, reviews):
+        ease, reps, interval_days = next_state(ease, reps, interval_days, reviews[word_id])
+        rows.append((ease, reps, interval_days, today + timedelta(days=interval_days), word_id))
+    update_schedule(config, rows)
+    return len(rows)
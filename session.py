@@ -0,0 +1,276 @@
+import threading
+
+from ancillary import add_newlines_to_row
+from my_sql_connector import random_sample, learn_new, from_within_last_n_days, learn_all, mark_as_learned, \
+    mark_as_unlearned, hide_word_forever, review_batch, SESSION_COLUMNS
+from scheduler import apply_reviews
+
+# Training modes of the second radio button field of main window
+LEARN_NEW = 0
+REPEAT_LAST_MONTH = 1
+REPEAT_CUSTOM_PERIOD = 2
+LEARN_ALL = 3
+SPACED_REPETITION = 4
+
+# Maximum length of a line of text on a card. Longer texts are wrapped
+CARD_TEXT_WIDTH = 60
+
+
+def training_query(mode, days=0):
+    """
+    Select a query for a random training mode
+    :param mode: int, one of LEARN_NEW, REPEAT_LAST_MONTH, REPEAT_CUSTOM_PERIOD, LEARN_ALL
+    :param days: int, the custom period for REPEAT_CUSTOM_PERIOD
+    :return: String
+    MySQL query
+    """
+    if mode == LEARN_NEW:
+        return learn_new(SESSION_COLUMNS)
+    elif mode == REPEAT_LAST_MONTH:
+        return from_within_last_n_days(30, SESSION_COLUMNS)
+    elif mode == REPEAT_CUSTOM_PERIOD:
+        return from_within_last_n_days(days, SESSION_COLUMNS)
+    elif mode == LEARN_ALL:
+        return learn_all(SESSION_COLUMNS)
+    else:
+        raise ValueError("Unknown training mode {}".format(mode))
+
+
+class SessionBatch:
+    """
+    The rows of one training session.
+    They are fetched by one query and kept in memory,
+    so the number of steps shown on the card always equals the number of rows served.
+    Iteration yields tuples (id, (Eng, EngT, EngEx, Rus, RusEx)).
+    """
+    __slots__ = ('ids', 'wellknown', 'rows')
+
+    def __init__(self, rows):
+        """
+        Initialization
+        :param rows: iterable of tuples (id, wellknown, Eng, EngT, EngEx, Rus, RusEx)
+        """
+        rows = tuple(rows)
+        self.ids = tuple(row[0] for row in rows)
+        self.wellknown = tuple(row[1] for row in rows)
+        self.rows = tuple(tuple(row[2:]) for row in rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return zip(self.ids, self.rows)
+
+    def __getitem__(self, index):
+        return self.ids[index], self.rows[index]
+
+
+class CardQueue:
+    """
+    The cards of a training session in the order of the test.
+    The texts of all cards are wrapped by add_newlines_to_row() when the queue is built,
+    i.e. in the worker thread together with the query, so taking the next card costs nothing.
+    Iteration yields tuples (id, (Eng, EngT, EngEx, Rus, RusEx), wrapped row).
+    """
+
+    def __init__(self, batch, width=CARD_TEXT_WIDTH):
+        """
+        Initialization
+        :param batch: SessionBatch
+        :param width: int, maximum length of a line of text on a card
+        """
+        self.batch = batch
+        self.texts = tuple(add_newlines_to_row(row, width) for row in batch.rows)
+        self.position = 0
+
+    def __len__(self):
+        return len(self.batch)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= len(self.batch):
+            raise StopIteration
+        index = self.position
+        self.position += 1
+        return self.batch.ids[index], self.batch.rows[index], self.texts[index]
+
+    def remaining(self):
+        """
+        :return: int, number of cards which are not shown yet
+        """
+        return len(self.batch) - self.position
+
+
+class WordStateCache:
+    """
+    The learning state of the words of a session.
+    Marks and hides change the state in memory only, so card navigation needs no database queries.
+    The changes are written to the database later by flush() with id-keyed updates.
+
+    Methods:
+    load,
+    reset,
+    is_marked,
+    toggle_mark,
+    hide,
+    review,
+    pending,
+    flush
+    """
+
+    def __init__(self, batch=None):
+        """
+        Initialization
+        :param batch: SessionBatch (optional)
+        """
+        self._lock = threading.Lock()
+        self._stored = {}
+        self._wellknown = {}
+        self._hidden = set()
+        self._reviews = {}
+        if batch is not None:
+            self.load(batch)
+
+    def load(self, batch):
+        """
+        Add the states of the words of a session batch
+        :param batch: SessionBatch
+        :return: None
+        """
+        with self._lock:
+            for word_id, wellknown in zip(batch.ids, batch.wellknown):
+                if word_id not in self._wellknown:
+                    self._stored[word_id] = wellknown
+                    self._wellknown[word_id] = wellknown
+
+    def reset(self):
+        """
+        Forget the states of the words which have no pending changes, so the next load() reads them
+        from the database again, e.g. after an import or a hide. Call it when a new session starts
+        :return: None
+        """
+        with self._lock:
+            pending = [word_id for word_id, wellknown in self._wellknown.items() if wellknown != self._stored[word_id]]
+            self._stored = {word_id: self._stored[word_id] for word_id in pending}
+            self._wellknown = {word_id: self._wellknown[word_id] for word_id in pending}
+
+    def is_marked(self, word_id):
+        """
+        :param word_id: int
+        :return: True if word is marked as wellknown. False otherwise
+        """
+        return self._wellknown[word_id] == 1
+
+    def toggle_mark(self, word_id):
+        """
+        Mark a word as learned if it is new and as new otherwise
+        :param word_id: int
+        :return: True if the word is marked as wellknown now
+        """
+        with self._lock:
+            self._wellknown[word_id] = 0 if self._wellknown[word_id] == 1 else 1
+            return self._wellknown[word_id] == 1
+
+    def hide(self, word_id):
+        """
+        Never show the word again
+        :param word_id: int
+        :return: None
+        """
+        with self._lock:
+            self._hidden.add(word_id)
+
+    def review(self, word_id, quality):
+        """
+        Remember the answer for the spaced repetition scheduler. Only the first answer for a word counts
+        :param word_id: int
+        :param quality: int from 0 to 5, see scheduler.grade()
+        :return: True if the answer is recorded
+        """
+        with self._lock:
+            if word_id in self._reviews:
+                return False
+            self._reviews[word_id] = quality
+            return True
+
+    def pending(self):
+        """
+        The changes which are not written yet
+        :return: three lists with ids of learned, unlearned and hidden words
+        """
+        with self._lock:
+            return self._pending()
+
+    def _pending(self):
+        learned = []
+        unlearned = []
+        for word_id, wellknown in self._wellknown.items():
+            if wellknown != self._stored[word_id]:
+                (learned if wellknown == 1 else unlearned).append(word_id)
+        return learned, unlearned, sorted(self._hidden)
+
+    def flush(self, config):
+        """
+        Write the pending changes to the database. At most five queries are sent.
+        The changes are taken under the lock and written without it, so the marks of the UI thread
+        do not wait for the database. If the writing fails, the changes stay pending
+        :param config: dict
+        see my_sql_connector.query_database(config, query) for details
+        :return: int, number of words updated
+        """
+        with self._lock:
+            learned, unlearned, hidden = self._pending()
+            written = {word_id: self._wellknown[word_id] for word_id in learned + unlearned}
+            self._hidden = set()
+            reviews, self._reviews = self._reviews, {}
+        try:
+            mark_as_learned(config, learned)
+            mark_as_unlearned(config, unlearned)
+            hide_word_forever(config, hidden)
+            # the last query: the reviews are not written if any query fails
+            reviewed = apply_reviews(config, reviews)
+        except Exception:
+            with self._lock:
+                self._hidden.update(hidden)
+                # the first answer for a word counts
+                reviews.update((word_id, quality) for word_id, quality in self._reviews.items()
+                               if word_id not in reviews)
+                self._reviews = reviews
+            raise
+        with self._lock:
+            # a word marked again while the changes were written stays pending
+            self._stored.update(written)
+        return len(learned) + len(unlearned) + len(hidden) + reviewed
+
+
+def fetch_session_batch(config, mode, limit, days=0):
+    """
+    Fetch rows for a training session in a single pass.
+    The words of SPACED_REPETITION mode are selected by the due date, the other modes are random
+    :param config: dict
+    see my_sql_connector.query_database(config, query) for details
+    :param mode: int, SPACED_REPETITION or see training_query(mode, days)
+    :param limit: int, maximum number of rows
+    :param days: int, the custom period for REPEAT_CUSTOM_PERIOD
+    :return: SessionBatch
+    """
+    if mode == SPACED_REPETITION:
+        return SessionBatch(review_batch(config, limit, SESSION_COLUMNS))
+    return SessionBatch(random_sample(config, training_query(mode, days), limit))
+
+
+def fetch_cards(config, mode, limit, days=0, width=CARD_TEXT_WIDTH):
+    """
+    Fetch a training session and prepare its cards.
+    The connection is returned to the pool as soon as the rows are read
+    :param config: dict
+    see my_sql_connector.query_database(config, query) for details
+    :param mode: int, see fetch_session_batch(config, mode, limit, days)
+    :param limit: int, maximum number of rows
+    :param days: int, the custom period for REPEAT_CUSTOM_PERIOD
+    :param width: int, maximum length of a line of text on a card
+    :return: CardQueue
+    """
+    return CardQueue(fetch_session_batch(config, mode, limit, days), width)
@@ -0,0 +1,303 @@
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+from query_trace import record_connect
+
+# Values of the 'backend' key of the MySQL notations
+BACKEND_MYSQL = 'mysql'
+BACKEND_SQLITE = 'sqlite'
+BACKENDS = (BACKEND_MYSQL, BACKEND_SQLITE)
+
+SQLITE_EXTENSION = '.sqlite3'
+# Seconds to wait for a lock held by another connection to the same file
+SQLITE_TIMEOUT = 30
+
+# MySQL error code of a table which does not exist
+NO_SUCH_TABLE = 1146
+
+# dates are stored as ISO strings, so they compare as the results of date('now') do
+sqlite3.register_adapter(date, date.isoformat)
+
+
+def backend_name(config):
+    """
+    The storage backend of a config
+    :param config: dict, see my_sql_connector.query_database for details
+    :return: String, one of BACKENDS. A config without the 'backend' key is a MySQL config
+    """
+    name = str(config.get('backend') or BACKEND_MYSQL).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError("Unknown storage backend '{}'. Use one of: {}".format(name, ", ".join(BACKENDS)))
+    return name
+
+
+def is_missing_table(error):
+    """
+    Check whether an error says that a table does not exist
+    :param error: Exception raised by a backend
+    :return: bool
+    """
+    if isinstance(error, sqlite3.OperationalError):
+        return str(error).startswith('no such table')
+    return getattr(error, 'errno', None) == NO_SUCH_TABLE
+
+
+class NoMySQLError(Exception):
+    """
+    Stands for the errors of mysql.connector while it is not loaded. It is never raised
+    """
+
+
+def mysql_errors():
+    """
+    The error classes of mysql.connector for isinstance() checks and except clauses, without importing it.
+    While mysql.connector is not loaded (an SQLite database, or the package is not installed) no MySQL error
+    can be raised, so NoMySQLError is returned for each of them
+    :return: tuple of the classes ProgrammingError, DatabaseError, InterfaceError
+    """
+    errors = sys.modules.get('mysql.connector.errors')
+    if errors is None:
+        return NoMySQLError, NoMySQLError, NoMySQLError
+    return errors.ProgrammingError, errors.DatabaseError, errors.InterfaceError
+
+
+class MySQLBackend:
+    """
+    MySQL server. The connections are taken from connection_pool.
+
+    Methods:
+    connection,
+    execute,
+    executemany
+    """
+    name = BACKEND_MYSQL
+
+    def __init__(self, config):
+        # mysql.connector is imported only if MySQL is used, SQLite installs do not need it
+        from connection_pool import get_pool
+        self.pool = get_pool(config)
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager for a connection. Commit on success and roll back on error.
+        The writes of one context are one transaction, see execute()
+        """
+        with self.pool.connection() as cnx:
+            cnx.backend_writes = False
+            yield cnx
+
+    def execute(self, cnx, query, parameters=()):
+        """
+        Execute a query and reopen the connection once if the server has gone away.
+        The query is not repeated after a write of the same transaction: the lost connection has rolled the write
+        back, so the error is raised and the caller repeats the whole transaction
+        :return: cursor
+        """
+        from connection_pool import is_connection_lost
+        cursor = cnx.cursor()
+        try:
+            cursor.execute(query, parameters)
+        except Exception as error:
+            if not is_connection_lost(error):
+                cursor.close()
+                raise
+            if cnx.backend_writes:
+                raise
+            self.pool.reconnect(cnx)
+            cursor = cnx.cursor()
+            cursor.execute(query, parameters)
+        if not query.lstrip().upper().startswith('SELECT'):
+            cnx.backend_writes = True
+        return cursor
+
+    def executemany(self, cnx, query, rows):
+        """
+        Execute a query for each row. MySQL Connector sends an INSERT as one multi-row statement
+        :return: None
+        """
+        cursor = cnx.cursor()
+        try:
+            cursor.executemany(query, rows)
+        finally:
+            cursor.close()
+        cnx.backend_writes = True
+
+    def close(self):
+        self.pool.close()
+
+
+def _translate_date_sub(match):
+    return "date('now', 'localtime', '-{} day')".format(match.group(1))
+
+
+# MySQL dialect -> SQLite dialect for the queries of my_sql_connector
+SQLITE_REPLACEMENTS = (
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"DATE_SUB\(CURDATE\(\),\s*INTERVAL\s+(-?\d+)\s+DAY\)", re.IGNORECASE), _translate_date_sub),
+    (re.compile(r"CURDATE\(\)", re.IGNORECASE), "date('now', 'localtime')"),
+    (re.compile(r"RAND\(\)", re.IGNORECASE), "RANDOM()"),
+)
+
+
+@lru_cache(maxsize=256)
+def to_sqlite(query):
+    """
+    Translate a query of my_sql_connector to SQLite.
+    The result is cached, so the same statement object is reused from the statement cache of sqlite3
+    :param query: String, MySQL query
+    :return: String, SQLite query
+    """
+    for pattern, replacement in SQLITE_REPLACEMENTS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _md5(text):
+    return None if text is None else hashlib.md5(text.encode()).hexdigest()
+
+
+class SQLiteBackend:
+    """
+    A single file database for one user. No server is required.
+
+    Each thread has its own connection which is kept open, so the prepared statements are reused.
+    The file is opened in WAL mode: the worker thread may write while the main thread reads.
+    The queries are written for MySQL and translated by to_sqlite().
+
+    Methods:
+    connection,
+    execute,
+    executemany,
+    close
+    """
+    name = BACKEND_SQLITE
+
+    def __init__(self, filename):
+        """
+        Initialization
+        :param filename: path to the database file. It is created on the first connection
+        """
+        self.filename = filename
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connect(self):
+        start = time.perf_counter()
+        cnx = sqlite3.connect(self.filename, timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        cnx.execute("PRAGMA journal_mode=WAL;")
+        cnx.execute("PRAGMA synchronous=NORMAL;")
+        cnx.create_function('MD5', 1, _md5, deterministic=True)
+        record_connect(time.perf_counter() - start)
+        with self._lock:
+            self._connections.append(cnx)
+        return cnx
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager for the connection of the current thread.
+        Commit on success and roll back on error. Nested contexts commit once, when the outer one exits
+        """
+        local = self._local
+        if getattr(local, 'cnx', None) is None:
+            local.cnx = self._connect()
+            local.depth = 0
+        cnx = local.cnx
+        local.depth += 1
+        try:
+            yield cnx
+            if local.depth == 1:
+                cnx.commit()
+        except GeneratorExit:
+            # a query generator is closed before the end. It is not an error
+            if local.depth == 1:
+                cnx.commit()
+            raise
+        except BaseException:
+            if local.depth == 1:
+                cnx.rollback()
+            raise
+        finally:
+            local.depth -= 1
+
+    def execute(self, cnx, query, parameters=()):
+        """
+        :return: cursor
+        """
+        return cnx.execute(to_sqlite(query), parameters)
+
+    def executemany(self, cnx, query, rows):
+        """
+        :return: None
+        """
+        cnx.executemany(to_sqlite(query), rows)
+
+    def close(self):
+        """
+        Close the connections of all threads
+        :return: None
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for cnx in connections:
+            cnx.close()
+        self._local = threading.local()
+
+
+def sqlite_filename(config):
+    """
+    The database file of an SQLite config
+    :param config: dict. 'database' is the name of the file. SQLITE_EXTENSION is added if there is no extension
+    :return: String
+    """
+    filename = str(config.get('database') or 'user_db')
+    if '.' not in filename.replace('\\', '/').rsplit('/', 1)[-1]:
+        filename += SQLITE_EXTENSION
+    return filename
+
+
+_sqlite_backends = {}
+_sqlite_lock = threading.Lock()
+
+
+def get_backend(config):
+    """
+    Return the storage backend for a config. SQLite backends are shared by all configs with the same file
+    :param config: dict, see my_sql_connector.query_database for details
+    :return: MySQLBackend or SQLiteBackend
+    """
+    if backend_name(config) == BACKEND_MYSQL:
+        return MySQLBackend(config)
+    filename = sqlite_filename(config)
+    with _sqlite_lock:
+        backend = _sqlite_backends.get(filename)
+        if backend is None:
+            backend = SQLiteBackend(filename)
+            _sqlite_backends[filename] = backend
+    return backend
+
+
+def close_backends():
+    """
+    Close all connections, e.g. before the program exits
+    :return: None
+    """
+    with _sqlite_lock:
+        backends = list(_sqlite_backends.values())
+        _sqlite_backends.clear()
+    for backend in backends:
+        backend.close()
+    try:
+        from connection_pool import close_pools
+    except ImportError:
+        return
+    close_pools()
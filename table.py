@@ -1,10 +1,36 @@
+# pandas, the Google API and the classifiers take most of the start time of the program and are needed
+# only for import and export. They are imported by the functions which use them, not by this module
+
+import os
+import pickle
 from math import isnan
 
-import pandas as pd
 
-from google_connector import reformat_table, load_table, save_table, prepare_table_to_export
-from table_classifier import excel_parser, classify_table, get_sheet_names, clear_data_drop_int, \
-    convert_empty_str_to_nan
+class EmptySpreadsheetError(ValueError):
+    """
+    Raised when an imported spreadsheet has no rows to store
+    """
+    pass
+
+
+def numeral_columns(recognized_columns):
+    """
+    :param recognized_columns: dict returned by classify_table(table)
+    :return: dict with the recognized columns of the table as the keys and their numbers in our order
+    Eng | EngT | EngEx | Rus | RusEx as the values
+    """
+    return {v: i for i, v in enumerate(recognized_columns.values()) if not isnan(v)}
+
+
+def order_columns(table, recognized_columns):
+    """
+    Put the columns recognized by classify_table(table) in our order: Eng | EngT | EngEx | Rus | RusEx
+    :param table: pd.DataFrame()
+    :param recognized_columns: dict returned by classify_table(table)
+    :return: pd.DataFrame()
+    """
+    columns = numeral_columns(recognized_columns)
+    return table[list(columns)].rename(columns=columns)
 
 
 def swap_columns(table):
@@ -15,10 +41,8 @@ def swap_columns(table):
     :param table: pd.DataFrame()
     :return: pd.DataFrame()
     """
-    recognized_columns = classify_table(table)
-    numeral_columns = {v: i for i, v in enumerate(recognized_columns.values()) if not isnan(v)}
-    # print(numeral_columns)
-    return table[[k for k in numeral_columns.keys()]].rename(columns=numeral_columns)
+    from table_classifier import classify_table
+    return order_columns(table, classify_table(table))
 
 
 class Table:
@@ -38,16 +62,42 @@ class Table:
     excel_export
     """
 
-    def __init__(self, google_notations=None, excel_notations=None):
+    def __init__(self, google_notations=None, excel_notations=None, sync_file='google_sync.pickle'):
         """
         Initialization
         :param google_notations: dict with Google Api credentials
         :param excel_notations: dict with excel file paths
+        :param sync_file: path to the file with the state of incremental Google imports
         """
         self.google_notations = google_notations
         self.excel_notations = excel_notations
-        self.table = pd.DataFrame(columns=[0, 1, 2, 3, 4])
+        self._frame = None
+        self._rows = []
         self.web_address = None
+        self.sheet_timings = {}
+        self.sync_file = sync_file
+        self._pending_sync = None
+
+    @property
+    def table(self):
+        """
+        The table as pd.DataFrame()
+        Rows added by add_row() are buffered and turned into the DataFrame here, in one step.
+        pandas is not imported until the DataFrame is needed
+        """
+        if self._frame is None or self._rows:
+            import pandas as pd
+            if self._frame is None:
+                self._frame = pd.DataFrame(columns=[0, 1, 2, 3, 4])
+            if self._rows:
+                self._frame = pd.concat([self._frame, pd.DataFrame(self._rows)], axis=0)
+                self._rows = []
+        return self._frame
+
+    @table.setter
+    def table(self, table):
+        self._frame = table
+        self._rows = []
 
     def get_robot_email(self):
         """
@@ -83,78 +133,135 @@ class Table:
     def add_row(self, row):
         """
         Add row to Table.table
+        The row is appended to a buffer, so adding n rows takes O(n) time
         :param row: list or tuple, len(row) <= 5
-        :return: pd.DataFrame: Table.table
+        :return: int, number of rows in Table.table
         """
-        self.table = pd.concat([self.table, pd.DataFrame(row).T], axis=0)
-        return self.table
+        self._rows.append(tuple(row))
+        return (0 if self._frame is None else len(self._frame)) + len(self._rows)
 
     def clear_table(self):
         """
-        Delete all from Table.table
-        :return: empty pd.DataFrame: Table.table
+        Delete all from Table.table. The empty DataFrame is created on the next access to Table.table
+        :return: None
         """
-        self.table = pd.DataFrame(columns=[0, 1, 2, 3, 4])
-        return self.table
+        self.table = None
 
-    def google_import(self):
+    def load_sync(self):
+        """
+        Load the state of incremental Google imports
+        :return: dict with spreadsheet names as the keys
+        """
+        if not os.path.exists(self.sync_file):
+            return {}
+        with open(self.sync_file, 'rb') as file:
+            return pickle.load(file)
+
+    def commit_sync(self):
+        """
+        Save the state of the last google_import() when its rows are stored in the database
+        :return: None
+        """
+        if self._pending_sync is None:
+            return
+        table_name, sync = self._pending_sync
+        syncs = self.load_sync()
+        syncs[table_name] = sync
+        with open(self.sync_file, 'wb') as file:
+            pickle.dump(syncs, file)
+        self._pending_sync = None
+
+    def google_import(self, incremental=False, client=None):
         """
         Import table from google spreadsheet
+        Call Table.commit_sync() after the rows are stored, so the next incremental import starts after them
+        :param incremental: bool (default False). Import only the rows added since the previous import
+        and reuse its column recognition, see google_connector.load_table_since()
+        :param client: gspread Client (optional)
         :return: pd.DataFrame() (local variable)
 
         note: to update Table.table, use command
         >> Table.table = Table.google_import()
         """
-        table = load_table(self.google_notations['your_json_file'],
-                           self.google_notations['table_name_for_import'])
-        table = clear_data_drop_int(table)
-        table = convert_empty_str_to_nan(table).dropna(how='all')  # clear empty rows in Google Spreadsheets
-        return swap_columns(table).applymap(lambda x: x.replace('"', "''") if isinstance(x, str) else x)
+        from google_connector import load_table_since
+        from table_classifier import classify_table, clear_data_drop_int, convert_empty_str_to_nan, data_columns
+
+        table_name = self.google_notations['table_name_for_import']
+        sync = self.load_sync().get(table_name) if incremental else None
+        table, new_sync, full = load_table_since(self.google_notations['your_json_file'], table_name, sync, client)
+        if full or not sync.get('raw_columns'):
+            columns = data_columns(table)
+            cleaned = clear_data_drop_int(table, columns)
+            cleaned = convert_empty_str_to_nan(cleaned).dropna(how='all')  # clear empty rows in Google Spreadsheets
+            raw_labels = {new: raw for raw, new in columns.items()}
+            raw_columns = {raw_labels[k]: v for k, v in numeral_columns(classify_table(cleaned)).items()}
+        else:
+            raw_columns = sync['raw_columns']
+        new_sync['raw_columns'] = raw_columns
+        self._pending_sync = (table_name, new_sync)
+        table = table[list(raw_columns)].rename(columns=raw_columns)
+        return convert_empty_str_to_nan(table).dropna(how='all')
 
-    def google_export(self, role='owner'):
+    def google_export(self, role='owner', append=False, progress=None):
         """
         Export Table.table to google spreadsheet
         :param role: user role (optional, default="owner". Also possible: "reader" and "writer")
+        :param append: bool (default False). Append to the spreadsheet with the same name if it exists
+        :param progress: function (optional). It is called with the number of rows written after each request
         :return: number of rows which are written
         """
-        data, table_range = prepare_table_to_export(self.table)
-        w = save_table(self.google_notations["your_json_file"],
-                       self.google_notations["user_email"],
-                       new_table=data,
-                       new_table_range=table_range,
-                       new_table_name=self.google_notations["table_name_for_export"],
-                       role=role)
+        from google_connector import export_table
+
+        w = export_table(self.google_notations["your_json_file"],
+                         self.google_notations["user_email"],
+                         rows=self.table.fillna('').values.tolist(),
+                         table_name=self.google_notations["table_name_for_export"],
+                         role=role,
+                         append=append,
+                         progress=progress)
         self.web_address = "https://docs.google.com/spreadsheets/d/{}".format(w.id)
         return len(self.table)
 
-    def excel_import(self):
+    def excel_import(self, workers=None):
         """
         Import table from excel file
+        The time spent on each sheet is saved to Table.sheet_timings
+        :param workers: int (optional). Parse and classify the sheets in a pool of `workers` processes
         :return: pd.DataFrame() (local variable)
 
         note: to update Table.table, use command
         >> Table.table = Table.excel_import()
         """
+        import pandas as pd
+        from table_classifier import read_workbook, read_workbook_parallel
+
         filename = self.excel_notations["file_path_for_import"]
-        table_gen = excel_parser(filename)
-        sheet_names = get_sheet_names(filename)
-        table = pd.DataFrame(columns=[0, 1, 2, 3, 4])
+        if workers:
+            sheets = read_workbook_parallel(filename, workers)
+        else:
+            sheets = read_workbook(filename, classify=True)
+        tables = [pd.DataFrame(columns=[0, 1, 2, 3, 4])]
         not_recognized = []
         errors = []
-        for sheet, sheet_name in zip(table_gen, sheet_names):
-            try:
-                sheet = swap_columns(sheet)
-                table = pd.concat([table, sheet], axis=0, ignore_index=True)
-            except IndexError as er:
-                not_recognized.append(sheet_name)
-                errors.append(er)
-        return table.applymap(lambda x: x.replace('"', "''") if isinstance(x, str) else x), not_recognized, errors
+        self.sheet_timings = {}
+        for sheet in sheets:
+            self.sheet_timings[sheet['sheet_name']] = sheet['seconds']
+            if sheet['table'].empty:
+                continue
+            if sheet['error'] is not None:
+                not_recognized.append(sheet['sheet_name'])
+                errors.append(sheet['error'])
+            else:
+                tables.append(order_columns(sheet['table'], sheet['columns_signs']))
+        return pd.concat(tables, axis=0, ignore_index=True), not_recognized, errors
 
     def excel_export(self):
         """
         Export Table.table to excel file
         :return: number of rows which are written
         """
+        from google_connector import reformat_table
+
         table = reformat_table(self.table)
         table.to_excel(self.excel_notations['file_path_for_export'], index=False, header=False)
         return len(self.table)
@@ -181,6 +288,5 @@ if __name__ == '__main__':
     # t.table = t.google_import()
     # t.google_export()
     # tab = t.google_import().head(5)
-    # tab = tab.applymap(lambda x: x.replace('"', "''"))
     # print(t1)
     # print(tab)
@@ -5,14 +5,169 @@
 # We classify columns of the table
 # We can relearn the program in order to enhance the accuracy of predictions. (But it is non needed)
 
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import count, takewhile
+from math import sqrt
+
 import pandas as pd
 import numpy as np
 import pickle
 
-from sklearn.pipeline import Pipeline
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.linear_model import SGDClassifier
-from sklearn import metrics
+from text_model import LinearTextModel, compact_filename, COMPACT_EXTENSION
+
+ENGLISH_ALPHABET = 'abcdefghijklmnopqrstuvwxyz '
+RUSSIAN_ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя '
+
+# alphabet_mask() converts this many cells at once to a fixed width array, so one long cell
+# does not make the array of the whole column huge
+ALPHABET_CHUNK_ROWS = 10000
+
+# Sampling mode of classify_table(): rows predicted per step, maximum rows per column
+# (also the rows which first_classifier() checks), and the number of standard errors which must separate the decisions
+SAMPLE_BATCH_SIZE = 100
+SAMPLE_MAX_SIZE = 2000
+CONFIDENCE_Z = 3.0
+
+# Columns of these dtypes are numerical, see data_columns()
+NUMERIC_DTYPES = ('int64', 'float64')
+# data_columns() counts the digits in all cells of a column only if a sample of this size is mixed
+COLUMN_SAMPLE_SIZE = 100
+
+ENG_MODEL_FILENAME = 'finalized_model_eng.sav'
+RUS_MODEL_FILENAME = 'finalized_model_rus.sav'
+
+# Private modules of sklearn renamed since the .sav models were saved (sklearn 0.21)
+RENAMED_SKLEARN_MODULES = {
+    'sklearn.linear_model.stochastic_gradient': 'sklearn.linear_model._stochastic_gradient',
+    'sklearn.linear_model.sgd_fast': 'sklearn.linear_model._sgd_fast',
+}
+
+
+class PipelineUnpickler(pickle.Unpickler):
+    """
+    Unpickler of the .sav models which finds the classes of the renamed sklearn modules
+    """
+
+    def find_class(self, module, name):
+        if module not in sys.modules and module in RENAMED_SKLEARN_MODULES:
+            try:
+                __import__(module)
+            except ImportError:
+                module = RENAMED_SKLEARN_MODULES[module]
+        return super().find_class(module, name)
+
+
+def load_pipeline(filename):
+    """
+    Load a model saved by predictor(). Needs sklearn
+    :param filename: path to saved model .sav
+    :return: Pipeline object (classifier)
+    """
+    with open(filename, 'rb') as file:
+        return PipelineUnpickler(file).load()
+
+
+class ModelRegistry:
+    """
+    Cache of the classifier models saved in files.
+    A model is loaded on the first use and loaded again only if its file is modified.
+    The compact model .npz next to a .sav file is preferred if it exists, so the classifiers run without
+    sklearn (see text_model.LinearTextModel). predictor() and export_model() write it with the .sav file
+
+    Methods:
+    get,
+    put,
+    reload,
+    stats
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_count = 0
+        self.load_time = 0.0
+
+    def _load(self, path):
+        start = time.perf_counter()
+        if path.endswith(COMPACT_EXTENSION):
+            model = LinearTextModel.load(path)
+        else:
+            model = load_pipeline(path)
+        self.load_time += time.perf_counter() - start
+        self.load_count += 1
+        return model
+
+    @staticmethod
+    def resolve(filename):
+        """
+        The file a model is loaded from
+        :param filename: path to saved model .sav or .npz
+        :return: absolute path to the compact model if it exists, to filename otherwise
+        """
+        path = os.path.abspath(filename)
+        compact = compact_filename(path)
+        # not compared by the modification time: a checkout of the repository sets it in any order
+        if compact != path and os.path.exists(compact):
+            return compact
+        return path
+
+    def get(self, filename):
+        """
+        Return the model saved in a file
+        :param filename: path to saved model .sav or .npz, see ModelRegistry.resolve()
+        :return: LinearTextModel or Pipeline object (classifier)
+        """
+        path = self.resolve(filename)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._models.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, self._load(path))
+                self._models[path] = cached
+        return cached[1]
+
+    def put(self, filename, model):
+        """
+        Register a model which is just saved to a file, so it is not loaded again
+        :param filename: path to saved model .sav or .npz
+        :param model: LinearTextModel or Pipeline object (classifier)
+        :return: model
+        """
+        path = os.path.abspath(filename)
+        with self._lock:
+            self._models[path] = (os.path.getmtime(path), model)
+        return model
+
+    def reload(self, filename=None):
+        """
+        Forget the cached models and load them again on the next use
+        :param filename: path to saved model .sav (optional). Forget all models if None
+        :return: None
+        """
+        with self._lock:
+            if filename is None:
+                self._models.clear()
+            else:
+                path = os.path.abspath(filename)
+                self._models.pop(path, None)
+                self._models.pop(compact_filename(path), None)
+
+    def stats(self):
+        """
+        :return: dict with number of cached models, number of loads and total load time in seconds
+        """
+        with self._lock:
+            return {'cached': len(self._models),
+                    'load_count': self.load_count,
+                    'load_time': self.load_time}
+
+
+models = ModelRegistry()
 
 
 def get_sheet_names(filename):
@@ -36,39 +191,151 @@ def get_sheet_names(filename):
 
 def convert_empty_str_to_nan(table):
     """
-    Convert all empty strings to np.NaN in a table
+    Convert all empty strings to np.nan in a table.
+    A column of empty strings becomes a float64 column of NaN
     :param table: pd.DataFrame()
     :return: pd.DataFrame()
     """
-    return table.applymap(lambda x: x if len(x) != 0 else np.NaN)
+    filled = table.ne('')
+    table = table.where(filled)
+    empty = table.columns[~filled.any().to_numpy()]
+    return table.astype(dict.fromkeys(empty, 'float64')) if len(empty) else table
 
 
-def clear_data_drop_int(table):
+def is_empty_column(column, positions):
+    """
+    Check whether a column has only NaN, None and empty strings
+    :param column: pd.Series
+    :param positions: positions of a sample of rows, see sample_positions()
+    :return: bool
+    """
+    if any(not pd.isna(cell) and cell != '' for cell in column.iloc[positions]):
+        return False
+    return not (column.notna() & column.ne('')).any()
+
+
+def is_digit_column(column, positions):
+    """
+    Check whether at least a half of the cells of a column are digits.
+    Cells are counted in the whole column only if the sample has both digits and other cells:
+    a column which has no digits in a sample of 100 rows has a half of digits with probability below 2 ** -100
+    :param column: pd.Series
+    :param positions: positions of a sample of rows, see sample_positions()
+    :return: bool
+    """
+    threshold = len(column) // 2
+    if threshold == 0:
+        return True
+    sample = [str(cell).isdigit() for cell in column.iloc[positions]]
+    if not any(sample):
+        return False
+    if all(sample):
+        return True
+    return sum(map(str.isdigit, map(str, column.to_numpy(dtype=object)))) >= threshold
+
+
+def data_columns(table):
+    """
+    Find the columns of pd.DataFrame() which are neither numerical nor empty.
+    A column is numerical if its dtype is one of NUMERIC_DTYPES or if at least a half of its cells are digits.
+    A column is empty if it has only NaN, None and empty strings.
+    The text columns are checked on a sample of rows first, see is_empty_column() and is_digit_column()
+    :param table: pandas.DataFrame() with the columns labeled by int from zero, e.g. pd.read_excel(header=None)
+    :return: dict with labels of such columns as the keys and int from zero in accent order as the values
+    """
+    positions = sample_positions(len(table), COLUMN_SAMPLE_SIZE, random_state=0)
+    columns_to_rename = {}
+    for label in takewhile(lambda label: label in table.columns, count()):
+        column = table[label]
+        if not (str(column.dtype) in NUMERIC_DTYPES or is_empty_column(column, positions)
+                or is_digit_column(column, positions)):
+            columns_to_rename[label] = len(columns_to_rename)
+    return columns_to_rename
+
+
+def clear_data_drop_int(table, columns=None):
     """
     Drop numerical and empty columns in pd.DataFrame() specified by table
     Rename the remained columns with int from zero in accent order
     :param table: pandas.DataFrame()
+    :param columns: dict returned by data_columns(table) (optional)
     :return: pandas.DataFrame()
     """
-    condition = True
-    i = 0
-    j = 0
-    columns_to_drop = []
-    columns_to_rename = {}
-    while condition:
+    if columns is None:
+        columns = data_columns(table)
+    return table[list(columns)].rename(columns=columns)
+
+
+def parse_sheet(xls, sheet_name, classify=False):
+    """
+    Parse a sheet of an open MS Excel file and recognize its columns if needed
+    :param xls: pd.ExcelFile
+    :param sheet_name: String
+    :param classify: bool (default False). Recognize the columns by classify_table()
+    :return: dict with keys
+    'sheet_name',
+    'table': pandas.DataFrame() cleared from numbers and empty columns,
+    'columns_signs': the result of classify_table() or None,
+    'error': IndexError raised by classify_table() or None,
+    'seconds': time spent on the sheet
+    """
+    start = time.perf_counter()
+    table = clear_data_drop_int(xls.parse(sheet_name, header=None))
+    columns_signs = None
+    error = None
+    if classify and not table.empty:
         try:
-            dtype_ = table[i].get_dtype_counts().index
-            # dtype_ = table[i].dtypes.value_counts().index
-            if ('int64' in dtype_ or 'float64' in dtype_
-                    or table[i].apply(lambda x: str(x).isdigit()).sum() >= len(table) // 2):
-                columns_to_drop.append(i)
-            else:
-                columns_to_rename[i] = j
-                j += 1
-            i += 1
-        except KeyError:
-            condition = False
-    return table.drop(columns=columns_to_drop).rename(columns=columns_to_rename)
+            columns_signs = classify_table(table)
+        except IndexError as er:
+            error = er
+    return {'sheet_name': sheet_name,
+            'table': table,
+            'columns_signs': columns_signs,
+            'error': error,
+            'seconds': time.perf_counter() - start}
+
+
+def read_workbook(filename, classify=False):
+    """
+    Generator of the sheets of MS Excel file. The file is opened and read once
+    :param filename: path to the .xls or .xlsx file
+    :param classify: bool (default False). Recognize the columns of each sheet
+    :return: dicts, see parse_sheet()
+    """
+    with pd.ExcelFile(filename) as xls:
+        for sheet_name in xls.sheet_names:
+            yield parse_sheet(xls, sheet_name, classify)
+
+
+def parse_sheets(filename, sheet_names, classify=False):
+    """
+    Parse some sheets of MS Excel file opened once. A task for a worker process of read_workbook_parallel()
+    :param filename: path to the .xls or .xlsx file
+    :param sheet_names: list of String
+    :param classify: bool (default False). Recognize the columns of each sheet
+    :return: list of dicts, see parse_sheet()
+    """
+    with pd.ExcelFile(filename) as xls:
+        return [parse_sheet(xls, sheet_name, classify) for sheet_name in sheet_names]
+
+
+def read_workbook_parallel(filename, workers=None, classify=True):
+    """
+    Parse and classify the sheets of MS Excel file in a process pool.
+    The sheets are split between the workers and each worker opens the file once
+    :param filename: path to the .xls or .xlsx file
+    :param workers: int, number of processes (optional, default is the number of CPUs)
+    :param classify: bool (default True). Recognize the columns of each sheet
+    :return: generator of dicts in the order of the sheets, see parse_sheet()
+    """
+    sheet_names = get_sheet_names(filename)
+    workers = min(workers or os.cpu_count() or 1, len(sheet_names)) or 1
+    parts = [sheet_names[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(parse_sheets, [filename] * workers, parts, [classify] * workers))
+    by_name = {sheet['sheet_name']: sheet for part in results for sheet in part}
+    for sheet_name in sheet_names:
+        yield by_name[sheet_name]
 
 
 def excel_parser(filename):
@@ -77,10 +344,9 @@ def excel_parser(filename):
     :param filename: path to the .xls or .xlsx file
     :return: pandas.DataFrame() cleared from numbers and empty columns. Max 5 columns.
     """
-    for number, current_sheet_name in enumerate(get_sheet_names(filename)):
-        table = clear_data_drop_int(pd.read_excel(io=filename, sheet_name=number, header=None, index=None))
-        if not table.empty:
-            yield table
+    for sheet in read_workbook(filename):
+        if not sheet['table'].empty:
+            yield sheet['table']
 
 
 def word_processing(word, alphabet):
@@ -107,8 +373,7 @@ def is_english(word):
     :param word: String
     :return: True if the word belongs to the English alphabet
     """
-    eng = 'abcdefghijklmnopqrstuvwxyz '
-    return word_processing(str(word).lower(), eng)
+    return word_processing(str(word).lower(), ENGLISH_ALPHABET)
 
 
 def is_russian(word):
@@ -117,8 +382,85 @@ def is_russian(word):
     :param word: String
     :return: True if the word belongs to the Russian alphabet
     """
-    rus = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя '
-    return word_processing(str(word).lower(), rus)
+    return word_processing(str(word).lower(), RUSSIAN_ALPHABET)
+
+
+@lru_cache(maxsize=None)
+def alphabet_lookup(alphabets):
+    """
+    Lookup table of the code points of the Basic Multilingual Plane for one or two alphabets.
+    The element of a character which is a letter of alphabets[i] after str.lower() is 1 << (16 * i),
+    so the sum of the elements of a word counts the letters of both alphabets at once
+    :param alphabets: tuple of String, e.g. (ENGLISH_ALPHABET, RUSSIAN_ALPHABET)
+    :return: np.array of uint32. The last element is zero, it stands for all greater code points
+    """
+    if not 0 < len(alphabets) <= 2:
+        raise ValueError("One or two alphabets are expected, got {}".format(len(alphabets)))
+    lowered = list(map(str.lower, map(chr, range(0x10000))))
+    lookup = np.zeros(0x10000 + 1, dtype=np.uint32)
+    for i, alphabet in enumerate(alphabets):
+        letters = set(alphabet)
+        lookup[[code for code, char in enumerate(lowered) if char in letters]] |= 1 << (16 * i)
+    return lookup[:np.flatnonzero(lookup).max() + 2]
+
+
+def alphabet_masks(column, alphabets):
+    """
+    Vectorized word_processing() for a whole column and one or two alphabets.
+    The cells are converted once to a fixed width array of code points (UCS4),
+    and the letters of the alphabets are counted by one pass through alphabet_lookup()
+    :param column: pd.Series
+    :param alphabets: tuple of String, e.g. (ENGLISH_ALPHABET, RUSSIAN_ALPHABET)
+    :return: list of pd.Series of bool, one for each alphabet. True where the word belongs to the alphabet
+    """
+    lookup = alphabet_lookup(tuple(alphabets))
+    cells = column.to_numpy(dtype=object)
+    masks = np.zeros((len(alphabets), len(cells)), dtype=bool)
+    for start in range(0, len(cells), ALPHABET_CHUNK_ROWS):
+        # astype(str) calls str() for the cells which are not strings, as word_processing() does
+        text = cells[start:start + ALPHABET_CHUNK_ROWS].astype(str)
+        width = text.dtype.itemsize // 4
+        codes = text.view(np.uint32).reshape(len(text), width)
+        letters = lookup.take(codes, mode='clip')
+        if width < 1 << 16:
+            totals = letters.sum(axis=1, dtype=np.uint32)
+            counts = [(totals >> (16 * i)) & 0xFFFF for i in range(len(alphabets))]
+        else:
+            # a word may have more letters than 16 bits can count
+            counts = [np.count_nonzero((letters >> (16 * i)) & 0xFFFF, axis=1) for i in range(len(alphabets))]
+        # the strings are padded by zeros up to the width
+        lengths = np.count_nonzero(codes, axis=1)
+        for i, hits in enumerate(counts):
+            masks[i, start:start + len(text)] = 2 * hits > lengths
+    return [pd.Series(mask, index=column.index) for mask in masks]
+
+
+def alphabet_mask(column, alphabet):
+    """
+    Vectorized word_processing() for a whole column
+    :param column: pd.Series
+    :param alphabet: String, e.g. ENGLISH_ALPHABET
+    :return: pd.Series of bool, True where the word belongs to the alphabet
+    """
+    return alphabet_masks(column, (alphabet,))[0]
+
+
+def english_mask(column):
+    """
+    Vectorized is_english()
+    :param column: pd.Series
+    :return: pd.Series of bool
+    """
+    return alphabet_mask(column, ENGLISH_ALPHABET)
+
+
+def russian_mask(column):
+    """
+    Vectorized is_russian()
+    :param column: pd.Series
+    :return: pd.Series of bool
+    """
+    return alphabet_mask(column, RUSSIAN_ALPHABET)
 
 
 def is_transcription(word):
@@ -149,9 +491,10 @@ def first_classifier(table):
     rus = []
     while True:
         try:
-            if table[i].apply(lambda x: is_english(x)).sum() >= num_of_rows // 2:
+            english, russian = alphabet_masks(table[i], (ENGLISH_ALPHABET, RUSSIAN_ALPHABET))
+            if english.sum() >= num_of_rows // 2:
                 eng.append(i)
-            elif table[i].apply(lambda x: is_russian(x)).sum() >= num_of_rows // 2:
+            elif russian.sum() >= num_of_rows // 2:
                 rus.append(i)
             else:
                 # elif table[i].apply(lambda x: not (is_russian(x) or is_english(x))).sum() >= num_of_rows // 2:
@@ -187,10 +530,7 @@ def prepare_learn_data(filename):
     :param filename: path to MS Excel file .xls or .xlsx
     :return: English and Russian datasets and its target (the target fits the both datasets, because it is 0 or 1)
     """
-    tables = excel_parser(filename)
-    table = pd.DataFrame()
-    for t in tables:
-        table = table.append(t.dropna())
+    table = pd.concat([t.dropna() for t in excel_parser(filename)])
     eng, rus, eng_t = first_classifier(table)
     eng_set, target = make_dataset(table, eng)
     rus_set, target = make_dataset(table, rus)
@@ -205,10 +545,17 @@ def predictor(dataset, target, show_info=False, save_result=False, out_filename=
     :param dataset: a list of String
     :param target: a list of String len(target) == len(dataset)
     :param show_info: bool (default False) Show metrics
-    :param save_result: bool (default False) Save the model
+    :param save_result: bool (default False) Save the model. The compact model .npz is saved next to it,
+    see export_model()
     :param out_filename: String. A name of the file you wont to save the model
     :return: Pipeline object (classifier)
     """
+    # sklearn is needed only to learn. The saved models are used by text_model.LinearTextModel
+    from sklearn.pipeline import Pipeline
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn import metrics
+
     text_clf = Pipeline([
         ('vector', CountVectorizer()),
         ('tfidf', TfidfTransformer()),
@@ -223,10 +570,39 @@ def predictor(dataset, target, show_info=False, save_result=False, out_filename=
               % (text_clf, metrics.classification_report(expected, predicted)))
         print("Confusion matrix:\n%s" % metrics.confusion_matrix(expected, predicted))
     if save_result:
-        pickle.dump(text_clf, open(out_filename, 'wb'))
+        with open(out_filename, 'wb') as file:
+            pickle.dump(text_clf, file)
+        models.put(out_filename, text_clf)
+        export_model(out_filename, text_clf)
     return text_clf
 
 
+def export_model(filename, model=None):
+    """
+    Save the compact model .npz of a model saved by predictor(). It is loaded instead of the .sav file,
+    see ModelRegistry. Loading the .sav file needs sklearn
+    :param filename: path to saved model .sav
+    :param model: Pipeline object (optional). It is loaded from filename if None
+    :return: path to the compact model
+    """
+    if model is None:
+        model = load_pipeline(filename)
+    compact = LinearTextModel.from_pipeline(model)
+    out_filename = compact_filename(filename)
+    compact.save(out_filename)
+    models.put(out_filename, compact)
+    return out_filename
+
+
+def export_models(filenames=(ENG_MODEL_FILENAME, RUS_MODEL_FILENAME)):
+    """
+    Save the compact models of the English and Russian classifiers
+    :param filenames: paths to saved models .sav
+    :return: list of paths to the compact models
+    """
+    return [export_model(filename) for filename in filenames]
+
+
 def relearn_model(filename, show_info=False):
     """
     Relearn the program with new data specifyed in filename
@@ -236,10 +612,10 @@ def relearn_model(filename, show_info=False):
     :return: two classifiers
     """
     eng, rus, target = prepare_learn_data(filename)
-    eng_file = 'finalized_model_eng.sav'
-    rus_file = 'finalized_model_rus.sav'
-    clf1 = predictor(dataset=eng, target=target, show_info=show_info, save_result=True, out_filename=eng_file)
-    clf2 = predictor(dataset=rus, target=target, show_info=show_info, save_result=True, out_filename=rus_file)
+    clf1 = predictor(dataset=eng, target=target, show_info=show_info, save_result=True,
+                     out_filename=ENG_MODEL_FILENAME)
+    clf2 = predictor(dataset=rus, target=target, show_info=show_info, save_result=True,
+                     out_filename=RUS_MODEL_FILENAME)
     return clf1, clf2
 
 
@@ -262,13 +638,12 @@ def predict_single_entry(classifier, text=None):
 
 def predict_column(column, model_filename):
     """
-    load the learning model from model_filename and predict each entry in a column of a table
+    Take the learning model from model_filename (see ModelRegistry) and predict each entry in a column of a table
     :param column: list. e.g. a column of a table
-    :param model_filename: path to saved model .sav
+    :param model_filename: path to saved model .sav or .npz
     :return: list with predictions (0 or 1 for each element)
     """
-    model = pickle.load(open(model_filename, 'rb'))
-    return model.predict(column)
+    return models.get(model_filename).predict(column)
 
 
 def classify_group(group, table, model_filename):
@@ -285,31 +660,122 @@ def classify_group(group, table, model_filename):
     return prediction
 
 
+def sample_positions(length, size, random_state=None):
+    """
+    Stratified sample of row positions.
+    The rows are split into `size` strata of equal length and one random row is taken from each stratum.
+    The positions are returned in random order, so any leading part of them is a random sample too
+    :param length: int, number of rows
+    :param size: int, number of positions required
+    :param random_state: seed for numpy.random.default_rng (optional)
+    :return: np.array of int
+    """
+    rng = np.random.default_rng(random_state)
+    if length <= size:
+        return rng.permutation(length)
+    bounds = np.linspace(0, length, size + 1).astype(int)
+    positions = bounds[:-1] + (rng.random(size) * (bounds[1:] - bounds[:-1])).astype(int)
+    return rng.permutation(positions)
+
+
+def is_separated(counts, size, z=CONFIDENCE_Z):
+    """
+    Check whether the predictions of a sample are enough for the decision of classify_table().
+    Two columns are separated if their mean predictions differ by more than z standard errors.
+    A single column is separated if its mean prediction differs from 0.5 by more than z standard errors
+    :param counts: list with the number of predictions equal to 1 for each column
+    :param size: int, sample size
+    :param z: float, number of standard errors
+    :return: bool
+    """
+    means = [count / size for count in counts]
+    # smoothed proportions, so a sample with no errors is not treated as certain
+    variances = [(count + 1) / (size + 2) * (size + 1 - count) / (size + 2) / size for count in counts]
+    if len(counts) == 1:
+        return abs(means[0] - 0.5) > z * sqrt(variances[0])
+    return abs(means[0] - means[1]) > z * sqrt(variances[0] + variances[1])
+
+
+def classify_group_sampled(group, table, model_filename, batch_size=SAMPLE_BATCH_SIZE,
+                           max_sample=SAMPLE_MAX_SIZE, z=CONFIDENCE_Z):
+    """
+    Like classify_group(), but predict a growing stratified sample of rows
+    and stop as soon as the decision is certain (see is_separated())
+    :param group: list returned by the first_classifier()
+    :param table: pd.DataFrame()
+    :param model_filename: path to saved model .sav
+    :param batch_size: int, rows predicted per step
+    :param max_sample: int, maximum number of rows predicted per column
+    :param z: float, number of standard errors, see is_separated()
+    :return: dict with numbers of the table columns as the keys and predictions as the values
+    or None if the sample is not enough for a decision
+    """
+    if len(group) == 0:
+        return {}
+    if len(group) > 2 or len(table) == 0:
+        return None
+    model = models.get(model_filename)
+    positions = sample_positions(len(table), max_sample)
+    counts = [0] * len(group)
+    size = 0
+    for start in range(0, len(positions), batch_size):
+        rows = positions[start:start + batch_size]
+        for i, column in enumerate(group):
+            counts[i] += int(np.sum(model.predict(table[column].iloc[rows].tolist())))
+        size += len(rows)
+        if is_separated(counts, size, z):
+            break
+    else:
+        if size < len(table):
+            return None
+    return {column: counts[i] / size for i, column in enumerate(group)}
+
+
+def predict_group(group, table, model_filename, sample=True):
+    """
+    Predict a group by a sample. Fall back to all rows if the sample is not enough
+    :param group: list returned by the first_classifier()
+    :param table: pd.DataFrame()
+    :param model_filename: path to saved model .sav
+    :param sample: bool (default True). Use classify_group_sampled() first
+    :return: dict, see classify_group()
+    """
+    prediction = classify_group_sampled(group, table, model_filename) if sample else None
+    if prediction is None:
+        prediction = classify_group(group, table, model_filename)
+    return prediction
+
+
 def drop_third_eng_column(table, eng):
-    df = table[eng].dropna().applymap(len).sum(axis=0)
+    df = table[eng].dropna().apply(lambda column: column.str.len()).sum(axis=0)
     return list(df.drop(df.idxmin()).index)
 
 
-def classify_table(table, eng_filename='finalized_model_eng.sav', rus_filename='finalized_model_rus.sav'):
+def classify_table(table, eng_filename=ENG_MODEL_FILENAME, rus_filename=RUS_MODEL_FILENAME, sample=True):
     """
     The most important function in this file!
     It figures out where is what in the table.
     :param table: pd.DataFrame()
     :param eng_filename: path to saved model .sav for English predictions
     :param rus_filename: path to saved model .sav for Russian predictions
+    :param sample: bool (default True). Split the columns into groups by a stratified sample of SAMPLE_MAX_SIZE rows
+    and predict a sample of rows instead of all rows if it is enough, see classify_group_sampled()
     :return: dict with keys 'Eng', 'engT', 'EngEx', 'Rus', 'RusEx' and numbers of the table columns as the values.
-    If some of the categories are absent in the table, returns np.NaN as the dict value
+    If some of the categories are absent in the table, returns np.nan as the dict value
     """
     table = table.dropna()
-    eng, rus, eng_t = first_classifier(table)
+    rows = table
+    if sample and len(table) > SAMPLE_MAX_SIZE:
+        rows = table.iloc[np.sort(sample_positions(len(table), SAMPLE_MAX_SIZE, random_state=0))]
+    eng, rus, eng_t = first_classifier(rows)
     if len(eng) > 2:
-        eng = drop_third_eng_column(table, eng)
-    columns_signs = {'Eng': np.NaN,
-                     'engT': np.NaN,
-                     'EngEx': np.NaN,
-                     'Rus': np.NaN,
-                     'RusEx': np.NaN}
-    eng_prediction = classify_group(eng, table, eng_filename)
+        eng = drop_third_eng_column(rows, eng)
+    columns_signs = {'Eng': np.nan,
+                     'engT': np.nan,
+                     'EngEx': np.nan,
+                     'Rus': np.nan,
+                     'RusEx': np.nan}
+    eng_prediction = predict_group(eng, table, eng_filename, sample)
     if len(eng_prediction) > 1:
         if eng_prediction[eng[0]] < eng_prediction[eng[1]]:
             columns_signs['Eng'] = eng[0]
@@ -325,7 +791,7 @@ def classify_table(table, eng_filename='finalized_model_eng.sav', rus_filename='
         else:
             columns_signs['EngEx'] = eng[0]
 
-    rus_prediction = classify_group(rus, table, rus_filename)
+    rus_prediction = predict_group(rus, table, rus_filename, sample)
     if len(rus_prediction) > 1:
         if rus_prediction[rus[0]] < rus_prediction[rus[1]]:
             columns_signs['Rus'] = rus[0]
@@ -355,10 +821,7 @@ def prepare_learning_data_from_first_classifier(filename):
     :param filename:
     :return:
     """
-    tables = excel_parser(filename)
-    table = pd.DataFrame()
-    for t in tables:
-        table = table.append(t.dropna())
+    table = pd.concat([t.dropna() for t in excel_parser(filename)])
     eng, rus, eng_t = first_classifier(table)
     out_set = []
     target = []
@@ -407,7 +870,7 @@ if __name__ == '__main__':
     print(rus_)
     #print(classify_group(eng_, table_, eng_filename_))
 
-    # print(table_[1].get_dtype_counts().index)
+    # print(table_[1].dtypes)
     # print_table(table_)
     # print(classify_table(table_))
 
@@ -0,0 +1,155 @@
+import os
+import re
+
+import numpy as np
+
+FORMAT_VERSION = 1
+COMPACT_EXTENSION = '.npz'
+# the default token pattern of sklearn CountVectorizer
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+def compact_filename(filename):
+    """
+    The file of the compact model for a model saved by pickle
+    :param filename: String, e.g. 'finalized_model_eng.sav'
+    :return: String, e.g. 'finalized_model_eng.npz'
+    """
+    return os.path.splitext(filename)[0] + COMPACT_EXTENSION
+
+
+class LinearTextModel:
+    """
+    The classifier of table_classifier.predictor() without sklearn:
+    bag of words (CountVectorizer) -> TF-IDF with l2 norm (TfidfTransformer) -> linear model (SGDClassifier).
+    The vocabulary, idf and the weights are kept in NumPy arrays and saved to .npz without pickle,
+    so the file loads fast and does not depend on the version of sklearn.
+
+    Methods:
+    decision_function,
+    predict,
+    save,
+    load,
+    from_pipeline
+    """
+
+    def __init__(self, terms, idf, coef, intercept, classes, lowercase=True, token_pattern=TOKEN_PATTERN):
+        """
+        Initialization
+        :param terms: list of String, the vocabulary in the order of the features
+        :param idf: np.array of float, idf of each term
+        :param coef: np.array of shape (number of classes or 1, number of terms)
+        :param intercept: np.array of shape (number of classes or 1,)
+        :param classes: np.array, the labels of the classes
+        :param lowercase: bool, convert the texts to lower case before tokenizing
+        :param token_pattern: String, regex of a token
+        """
+        self.terms = [str(term) for term in terms]
+        self.index = {term: i for i, term in enumerate(self.terms)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.coef = np.atleast_2d(np.asarray(coef, dtype=np.float64))
+        self.intercept = np.asarray(intercept, dtype=np.float64).ravel()
+        self.classes = np.asarray(classes)
+        self.lowercase = bool(lowercase)
+        self.token_pattern = re.compile(token_pattern)
+
+    def decision_function(self, texts):
+        """
+        Scores of the texts as SGDClassifier.decision_function() of the pipeline computes them
+        :param texts: list of String
+        :return: np.array of shape (len(texts),) for two classes, (len(texts), number of classes) otherwise
+        """
+        size = len(texts)
+        documents = []
+        features = []
+        for number, text in enumerate(texts):
+            if self.lowercase:
+                text = text.lower()
+            for token in self.token_pattern.findall(text):
+                feature = self.index.get(token)
+                if feature is not None:
+                    documents.append(number)
+                    features.append(feature)
+        pairs, counts = np.unique(np.array(documents, dtype=np.int64) * len(self.terms)
+                                  + np.array(features, dtype=np.int64), return_counts=True)
+        documents, features = np.divmod(pairs, len(self.terms))
+        values = counts * self.idf[features]
+        norms = np.sqrt(np.bincount(documents, values ** 2, minlength=size))
+        norms[norms == 0] = 1.0
+        values /= norms[documents]
+        scores = np.column_stack([np.bincount(documents, values * row[features], minlength=size)
+                                  for row in self.coef]) + self.intercept
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict(self, texts):
+        """
+        :param texts: list of String
+        :return: np.array with a class label for each text
+        """
+        scores = self.decision_function(texts)
+        if scores.ndim == 1:
+            return self.classes[(scores > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
+    def save(self, filename):
+        """
+        Save the model to .npz file
+        :param filename: path to the file
+        :return: None
+        """
+        with open(filename, 'wb') as file:
+            np.savez_compressed(file,
+                                format=np.array(FORMAT_VERSION),
+                                terms=np.array(self.terms, dtype=str),
+                                idf=self.idf,
+                                coef=self.coef,
+                                intercept=self.intercept,
+                                classes=self.classes,
+                                lowercase=np.array(self.lowercase),
+                                token_pattern=np.array(self.token_pattern.pattern))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a model saved by LinearTextModel.save()
+        :param filename: path to .npz file
+        :return: LinearTextModel
+        """
+        with np.load(filename, allow_pickle=False) as data:
+            if int(data['format']) != FORMAT_VERSION:
+                raise ValueError("Unknown format {} of the model {}".format(int(data['format']), filename))
+            return cls(data['terms'].tolist(), data['idf'], data['coef'], data['intercept'], data['classes'],
+                       bool(data['lowercase']), str(data['token_pattern']))
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Take the vocabulary and the weights of a trained pipeline of table_classifier.predictor()
+        :param pipeline: sklearn Pipeline with the steps 'vector', 'tfidf' and 'clf'
+        :return: LinearTextModel
+        """
+        vector = pipeline.named_steps['vector']
+        tfidf = pipeline.named_steps['tfidf']
+        clf = pipeline.named_steps['clf']
+        unsupported = [name for name, supported in (
+            ('analyzer', vector.analyzer == 'word'),
+            ('ngram_range', tuple(vector.ngram_range) == (1, 1)),
+            ('binary', not vector.binary),
+            ('preprocessor', vector.preprocessor is None),
+            ('tokenizer', vector.tokenizer is None),
+            ('strip_accents', vector.strip_accents is None),
+            ('stop_words', not vector.stop_words),
+            ('norm', tfidf.norm == 'l2'),
+            ('sublinear_tf', not tfidf.sublinear_tf)) if not supported]
+        if unsupported:
+            raise ValueError("The pipeline can not be exported, unsupported parameters: {}".format(
+                ", ".join(unsupported)))
+        terms = sorted(vector.vocabulary_, key=vector.vocabulary_.get)
+        if not tfidf.use_idf:
+            idf = np.ones(len(terms))
+        elif hasattr(tfidf, 'idf_'):
+            idf = tfidf.idf_
+        else:
+            # the models pickled by old versions of sklearn (e.g. 0.21) keep idf as a sparse diagonal matrix only
+            idf = np.ravel(tfidf._idf_diag.sum(axis=0))
+        return cls(terms, idf, clf.coef_, clf.intercept_, clf.classes_, vector.lowercase, vector.token_pattern)
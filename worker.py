@@ -0,0 +1,192 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+
+# How often the Tk main loop looks for the results of background tasks, ms
+POLL_INTERVAL = 50
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a background task when the user has cancelled it
+    """
+    pass
+
+
+class Task:
+    """
+    A handle of a function which runs in TaskRunner.
+
+    The function gets the task as the first argument. A long function should call task.report(value)
+    from time to time: it sends the progress to the main thread and raises TaskCancelled
+    if the task is cancelled, so the function stops between two steps.
+    A task which is not cancellable, e.g. writing the progress of a session, always runs to the end.
+
+    Methods:
+    report,
+    check,
+    cancel
+    """
+
+    def __init__(self, runner, description, on_done, on_error, on_progress, cancellable=True):
+        self.runner = runner
+        self.description = description
+        self.cancellable = cancellable
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        """
+        Stop the task if it is cancelled. Call it from the worker thread only
+        :return: None
+        """
+        if self.cancelled:
+            raise TaskCancelled(self.description)
+
+    def report(self, value):
+        """
+        Send the progress to the main thread. Call it from the worker thread only
+        :param value: anything which on_progress accepts, e.g. the number of rows done
+        :return: None
+        """
+        self.check()
+        if self.on_progress is not None:
+            self.runner.post(self.on_progress, value)
+
+    def cancel(self):
+        """
+        Ask the task to stop. The task which is not started yet is not run at all.
+        on_error is called with TaskCancelled when the task stops. Does nothing if the task is not cancellable
+        :return: None
+        """
+        if self.cancellable:
+            self._cancel_event.set()
+
+
+class TaskRunner:
+    """
+    Run blocking calls (MySQL, Google API, Excel files) in a worker thread
+    and return their results to the Tk main loop.
+
+    Callbacks on_done, on_error and on_progress are always called in the main thread through root.after,
+    so they may touch the widgets. The worker functions must not touch the widgets.
+
+    >> runner = TaskRunner(root)
+    >> runner.submit(lambda task: count_words(config), on_done=show_counts)
+
+    Methods:
+    submit,
+    post,
+    cancel_all,
+    shutdown
+    """
+
+    def __init__(self, root, workers=1, poll_interval=POLL_INTERVAL):
+        """
+        Initialization
+        :param root: tkinter.Tk()
+        :param workers: int, number of worker threads. One worker keeps the tasks in the order of submission
+        :param poll_interval: int, ms between checks of the finished tasks
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='language_training')
+        self._messages = Queue()
+        self._tasks = set()
+        self._polling = False
+
+    @property
+    def busy(self):
+        return bool(self._tasks)
+
+    def submit(self, function, *args, description='', on_done=None, on_error=None, on_progress=None,
+               cancellable=True):
+        """
+        Run function(task, *args) in the worker thread
+        :param function: the blocking function
+        :param args: the arguments of the function after the task
+        :param description: String, e.g. for the status bar
+        :param on_done: function of the result (optional)
+        :param on_error: function of the exception (optional). The exception is raised in the main thread
+        if on_error is not specified, so Tk reports it as it reports errors of callbacks
+        :param on_progress: function of the value passed to task.report() (optional)
+        :param cancellable: bool (default True). False if cancel_all() must not stop the task
+        :return: Task
+        """
+        task = Task(self, description, on_done, on_error, on_progress, cancellable)
+        self._tasks.add(task)
+        # the task runs in the context of the caller, e.g. with query_trace.operation()
+        context = contextvars.copy_context()
+        task.future = self._executor.submit(context.run, self._run, task, function, args)
+        self._schedule_poll()
+        return task
+
+    def _run(self, task, function, args):
+        try:
+            task.check()
+            result = function(task, *args)
+        except BaseException as error:
+            self._messages.put((self._finish, (task, None, error)))
+        else:
+            self._messages.put((self._finish, (task, result, None)))
+
+    def post(self, callback, *args):
+        """
+        Call callback(*args) in the main thread. Thread-safe
+        :return: None
+        """
+        self._messages.put((callback, args))
+
+    def _finish(self, task, result, error):
+        self._tasks.discard(task)
+        if error is None:
+            if task.on_done is not None:
+                task.on_done(result)
+        elif task.on_error is not None:
+            task.on_error(error)
+        elif not isinstance(error, TaskCancelled):
+            raise error
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._polling = False
+        try:
+            while True:
+                try:
+                    callback, args = self._messages.get_nowait()
+                except Empty:
+                    break
+                callback(*args)
+        finally:
+            if self._tasks or not self._messages.empty():
+                self._schedule_poll()
+
+    def cancel_all(self):
+        """
+        Cancel all tasks which are running or waiting, except the tasks which are not cancellable
+        :return: None
+        """
+        for task in list(self._tasks):
+            task.cancel()
+
+    def shutdown(self, wait=True):
+        """
+        Cancel the tasks and stop the worker threads, e.g. before the program exits.
+        The tasks which are not cancellable are completed
+        :param wait: bool (default True). Wait for the running task to stop
+        :return: None
+        """
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)